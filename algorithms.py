@@ -1,88 +1,147 @@
-import pygame
-import heapq
 import math
-from grid import Node, Grid
+from open_list import OpenList
+from jps_plus import DIRECTION_INDEX
+from heuristics import DistanceHeuristic, NearestGoalIndex, resolve_heuristic
+from search_trace import EXPAND, PUSH, EXPAND_BWD, PUSH_BWD
 
-# --- Helper Functions (Unchanged) ---
-def _heuristic(node_a, node_b):
-    return abs(node_a.row - node_b.row) + abs(node_a.col - node_b.col)
+# All searches work on integer cell ids and keep their g-costs and parent pointers in
+# dicts local to the query, so a search only pays for the cells it touches and several
+# searches can share one read-only Grid.
+#
+# The searches do no I/O. When a draw_callback is given it is called after every
+# expansion with the current open and closed sets; returning False cancels the search,
+# which then reports no path. Event handling belongs to the caller's callback.
+# Passing trace=search_trace.SearchTrace() records every expansion and push instead,
+# at the cost of one array append per event, and stats=stats.SearchStats() collects
+# counters and phase timers. `explored` is the number of expansions for every search.
+# Queries the grid's component labels prove unreachable return at once with
+# explored == 0 instead of flooding the start's region.
+#
+# Each search is written as a generator, <name>_steps, that takes the same arguments
+# and yields the number of cells expanded so far after every expansion; its return
+# value is the (found, path, explored) result. <name>_search runs it to completion.
+# stepping.SearchStepper advances one in bounded slices instead.
 
-def _get_distance(node_a, node_b):
-    dist_row = node_a.row - node_b.row
-    dist_col = node_a.col - node_b.col
-    return math.sqrt(dist_row**2 + dist_col**2)
+# --- Helper Functions ---
+# JPS prices jumps by distance alone, so its heuristic must not be scaled by terrain.
+_JPS_HEURISTIC = DistanceHeuristic('octile', scale_by_terrain=False)
 
-def _reconstruct_path(end_node):
+def _get_distance(grid, cell_a, cell_b):
+    row_a, col_a = divmod(cell_a, grid.cols)
+    row_b, col_b = divmod(cell_b, grid.cols)
+    return math.sqrt((row_a - row_b)**2 + (col_a - col_b)**2)
+
+def path_cost(grid, path):
+    """
+    Cost of a path returned by any of the searches (Nodes or cell ids). Consecutive
+    cells need not be adjacent: JPS returns jump points and Theta* any-angle
+    waypoints, so every leg is priced as a straight line with grid.line_cost.
+    Returns infinity if a leg is blocked.
+    """
+    cells = [getattr(cell, 'id', cell) for cell in path]
+    total = 0.0
+    for a, b in zip(cells, cells[1:]):
+        cost = grid.line_cost(a, b)
+        if cost is None:
+            return math.inf
+        total += cost
+    return total
+
+def run_steps(steps):
+    """ Runs a search generator (one of the *_steps functions) to completion and returns its result. """
+    try:
+        while True:
+            next(steps)
+    except StopIteration as finished:
+        return finished.value
+
+def _reconstruct_path(grid, parent, end_cell):
     path = []
-    current_node = end_node
-    while current_node is not None:
-        path.append(current_node)
-        current_node = current_node.parent
+    current_cell = end_cell
+    while current_cell is not None:
+        path.append(grid.node(current_cell))
+        current_cell = parent[current_cell]
     return path[::-1]
 
 # --- Core A* Algorithm (MODIFIED to return metrics) ---
-def a_star_search(draw_callback, grid, start_node, end_node, weight=1.0):
-    grid.reset_pathfinding_data()
-    open_set_heap = []
-    open_set_hash = {start_node}
+def a_star_steps(draw_callback, grid, start_node, end_node, weight=1.0, heuristic='octile', trace=None, stats=None):
+    """ Generator form of a_star_search: yields the number of cells expanded so far after each expansion. """
+    if stats is not None: stats.begin()
+    start, end = start_node.id, end_node.id
+    if not grid.reachable(start, end):
+        if stats is not None: stats.end()
+        return False, {}, 0
+    record = trace.events.append if trace is not None else None
+    terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+    h = resolve_heuristic(heuristic).bind(grid, end)
+    g_cost = {start: 0}
+    parent = {start: None}
+    open_list = OpenList()
     closed_set = set()
-    start_node.g_cost = 0
-    start_node.h_cost = _heuristic(start_node, end_node)
-    start_node.f_cost = start_node.g_cost + (start_node.h_cost * weight)
-    heapq.heappush(open_set_heap, (start_node.f_cost, start_node))
+    start_h = h(start)
+    open_list.push(start, start_h * weight, start_h)
+    if record: record(start << 2 | PUSH)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_list:
+            current = open_list.pop()
+            if record: record(current << 2 | EXPAND)
+            if current == end:
+                if stats is not None: stats.phase('path')
+                path = _reconstruct_path(grid, parent, end)
+                return True, path, len(closed_set)
+            current_g = g_cost[current]
+            neighbors = moves[adjacency[current]]
+            for offset, distance in neighbors:
+                neighbor = current + offset
+                if neighbor in closed_set:
+                    continue
+                tentative_g_cost = current_g + distance * terrain[neighbor]
+                if tentative_g_cost < g_cost.get(neighbor, math.inf):
+                    parent[neighbor] = current
+                    g_cost[neighbor] = tentative_g_cost
+                    h_cost = h(neighbor)
+                    open_list.push(neighbor, tentative_g_cost + h_cost * weight, h_cost)
+                    if record: record(neighbor << 2 | PUSH)
+            closed_set.add(current)
+            if stats is not None: stats.expanded(len(neighbors), len(open_list))
+            if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed_set) is False:
+                return False, {}, len(closed_set)
+            yield len(closed_set)
+        return False, {}, len(closed_set)
+    finally:
+        if stats is not None: stats.end(open_list)
 
-    while open_set_heap:
-        if draw_callback:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return False, {}, 0
-        _, current_node = heapq.heappop(open_set_heap)
-        open_set_hash.remove(current_node)
-        if current_node == end_node:
-            path = _reconstruct_path(end_node)
-            return True, path, len(closed_set)
-        for neighbor in grid.get_neighbors(current_node):
-            if neighbor in closed_set:
-                continue
-            step_cost = _get_distance(current_node, neighbor) * neighbor.terrain_cost
-            tentative_g_cost = current_node.g_cost + step_cost
-            if tentative_g_cost < neighbor.g_cost:
-                neighbor.parent = current_node
-                neighbor.g_cost = tentative_g_cost
-                neighbor.h_cost = _heuristic(neighbor, end_node)
-                neighbor.f_cost = neighbor.g_cost + (neighbor.h_cost * weight)
-                if neighbor not in open_set_hash:
-                    heapq.heappush(open_set_heap, (neighbor.f_cost, neighbor))
-                    open_set_hash.add(neighbor)
-        if draw_callback:
-            draw_callback(open_set=open_set_hash, closed_set=closed_set)
-        if current_node != start_node:
-            closed_set.add(current_node)
-    return False, {}, len(closed_set)
+def a_star_search(draw_callback, grid, start_node, end_node, weight=1.0, heuristic='octile', trace=None, stats=None):
+    """ `heuristic` is a heuristics.Heuristic or a name from heuristics.HEURISTICS. """
+    return run_steps(a_star_steps(draw_callback, grid, start_node, end_node, weight, heuristic, trace, stats))
 
 # --- Wrappers (Unchanged) ---
-def dijkstra_search(draw_callback, grid, start_node, end_node):
-    return a_star_search(draw_callback, grid, start_node, end_node, weight=0.0)
+def dijkstra_steps(draw_callback, grid, start_node, end_node, trace=None, stats=None):
+    return a_star_steps(draw_callback, grid, start_node, end_node, weight=0.0, trace=trace, stats=stats)
+
+def dijkstra_search(draw_callback, grid, start_node, end_node, trace=None, stats=None):
+    return a_star_search(draw_callback, grid, start_node, end_node, weight=0.0, trace=trace, stats=stats)
+
+def weighted_a_star_steps(draw_callback, grid, start_node, end_node, weight=1.5, heuristic='octile', trace=None, stats=None):
+    return a_star_steps(draw_callback, grid, start_node, end_node, weight=weight, heuristic=heuristic, trace=trace, stats=stats)
 
-def weighted_a_star_search(draw_callback, grid, start_node, end_node, weight=1.5):
-    return a_star_search(draw_callback, grid, start_node, end_node, weight=weight)
+def weighted_a_star_search(draw_callback, grid, start_node, end_node, weight=1.5, heuristic='octile', trace=None, stats=None):
+    return a_star_search(draw_callback, grid, start_node, end_node, weight=weight, heuristic=heuristic, trace=trace, stats=stats)
 
 # --- JPS Implementation (MODIFIED to return metrics) ---
-# ... (Helper functions _is_walkable, _identify_successors, _jump are unchanged) ...
 def _is_walkable(grid, row, col):
-    node = grid.get_node(row, col)
-    return node is not None and not node.is_obstacle
-def _identify_successors(grid, current_node, start_node, end_node):
-    successors, neighbors, parent = [], [], current_node.parent
-    r, c = current_node.row, current_node.col
-    if parent is None:
+    return 0 <= row < grid.rows and 0 <= col < grid.cols and not grid.obstacles[row * grid.cols + col]
+def _identify_successors(grid, current, parent_cell, end, jump_table=None, stats=None):
+    successors, neighbors = [], []
+    r, c = divmod(current, grid.cols)
+    if parent_cell is None:
         for dr in [-1,0,1]:
             for dc in [-1,0,1]:
                 if dr==0 and dc==0: continue
                 if _is_walkable(grid, r+dr, c+dc): neighbors.append((dr,dc))
     else:
-        pr, pc = parent.row, parent.col
+        pr, pc = divmod(parent_cell, grid.cols)
         dr, dc = (r - pr) // max(1, abs(r-pr)), (c - pc) // max(1, abs(c-pc))
         if dr != 0 and dc != 0:
             if _is_walkable(grid, r, c+dc): neighbors.append((0,dc))
@@ -103,177 +162,369 @@ def _identify_successors(grid, current_node, start_node, end_node):
                     if not _is_walkable(grid, r, c+1): neighbors.append((dr,1))
                     if not _is_walkable(grid, r, c-1): neighbors.append((dr,-1))
     for dr, dc in neighbors:
-        jump_point = _jump(grid, r, c, dr, dc, start_node, end_node)
-        if jump_point: successors.append(jump_point)
+        if jump_table is not None:
+            if stats is not None: stats.jump_calls += 1
+            jump_point = jump_table.jump(current, DIRECTION_INDEX[(dr, dc)], end)
+        else:
+            jump_point = _jump(grid, r, c, dr, dc, end, stats)
+        if jump_point is not None: successors.append(jump_point)
     return successors
-def _jump(grid, r, c, dr, dc, start_node, end_node):
-    nr, nc = r+dr, c+dc
-    if not _is_walkable(grid, nr, nc): return None
-    neighbor_node = grid.get_node(nr, nc)
-    if neighbor_node == end_node: return neighbor_node
-    if dr!=0 and dc!=0:
-        if (not _is_walkable(grid, nr-dr, nc) and _is_walkable(grid, nr-dr, nc+dc)) or \
-           (not _is_walkable(grid, nr, nc-dc) and _is_walkable(grid, nr+dr, nc-dc)):
-            return neighbor_node
-    else:
-        if dr!=0:
+def _jump(grid, r, c, dr, dc, end, stats=None):
+    # Iterative so long open corridors cannot hit the recursion limit. Straight
+    # jumps never recurse; a diagonal jump probes both straight components at each step.
+    if stats is not None: stats.jump_calls += 1
+    while True:
+        nr, nc = r+dr, c+dc
+        if not _is_walkable(grid, nr, nc): return None
+        neighbor = nr * grid.cols + nc
+        if neighbor == end: return neighbor
+        if dr!=0 and dc!=0:
+            if (not _is_walkable(grid, nr-dr, nc) and _is_walkable(grid, nr-dr, nc+dc)) or \
+               (not _is_walkable(grid, nr, nc-dc) and _is_walkable(grid, nr+dr, nc-dc)):
+                return neighbor
+            if _jump(grid, nr, nc, dr, 0, end, stats) is not None or _jump(grid, nr, nc, 0, dc, end, stats) is not None:
+                return neighbor
+        elif dr!=0:
             if (not _is_walkable(grid, nr, nc+1) and _is_walkable(grid, nr+dr, nc+1)) or \
                (not _is_walkable(grid, nr, nc-1) and _is_walkable(grid, nr+dr, nc-1)):
-                return neighbor_node
+                return neighbor
         else:
             if (not _is_walkable(grid, nr+1, nc) and _is_walkable(grid, nr+1, nc+dc)) or \
                (not _is_walkable(grid, nr-1, nc) and _is_walkable(grid, nr-1, nc+dc)):
-                return neighbor_node
-    if dr!=0 and dc!=0:
-        if _jump(grid, nr, nc, dr, 0, start_node, end_node) or _jump(grid, nr, nc, 0, dc, start_node, end_node):
-            return neighbor_node
-    return _jump(grid, nr, nc, dr, dc, start_node, end_node)
-def jps_search(draw_callback, grid, start_node, end_node):
-    grid.reset_pathfinding_data()
-    open_set_heap = []
-    open_set_hash = {start_node}
+                return neighbor
+        r, c = nr, nc
+def jps_steps(draw_callback, grid, start_node, end_node, jump_table=None, trace=None, stats=None):
+    """ Generator form of jps_search: yields the number of cells expanded so far after each expansion. """
+    if stats is not None: stats.begin()
+    start, end = start_node.id, end_node.id
+    if not grid.reachable(start, end):
+        if stats is not None: stats.end()
+        return False, {}, 0
+    record = trace.events.append if trace is not None else None
+    g_cost = {start: 0}
+    parent = {start: None}
+    open_list = OpenList()
     closed_set = set()
-    start_node.g_cost = 0
-    start_node.h_cost = _heuristic(start_node, end_node)
-    start_node.f_cost = start_node.g_cost + start_node.h_cost
-    heapq.heappush(open_set_heap, (start_node.f_cost, start_node))
-    while open_set_heap:
-        if draw_callback:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: pygame.quit(); return False, {}, 0
-        _, current_node = heapq.heappop(open_set_heap)
-        open_set_hash.remove(current_node)
-        if current_node == end_node:
-            path = _reconstruct_path(end_node)
-            return True, path, len(closed_set)
-        closed_set.add(current_node)
-        successors = _identify_successors(grid, current_node, start_node, end_node)
-        for successor in successors:
-            if successor in closed_set: continue
-            tentative_g_cost = current_node.g_cost + _get_distance(current_node, successor)
-            if tentative_g_cost < successor.g_cost:
-                successor.parent = current_node
-                successor.g_cost = tentative_g_cost
-                successor.h_cost = _heuristic(successor, end_node)
-                successor.f_cost = successor.g_cost + successor.h_cost
-                if successor not in open_set_hash:
-                    heapq.heappush(open_set_heap, (successor.f_cost, successor))
-                    open_set_hash.add(successor)
-        if draw_callback:
-            draw_callback(open_set=open_set_hash, closed_set=closed_set)
-    return False, {}, len(closed_set)
+    h = _JPS_HEURISTIC.bind(grid, end)
+    start_h = h(start)
+    open_list.push(start, start_h, start_h)
+    if record: record(start << 2 | PUSH)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_list:
+            current = open_list.pop()
+            if record: record(current << 2 | EXPAND)
+            if current == end:
+                if stats is not None: stats.phase('path')
+                path = _reconstruct_path(grid, parent, end)
+                return True, path, len(closed_set)
+            closed_set.add(current)
+            current_g = g_cost[current]
+            successors = _identify_successors(grid, current, parent[current], end, jump_table, stats)
+            for successor in successors:
+                if successor in closed_set: continue
+                tentative_g_cost = current_g + _get_distance(grid, current, successor)
+                if tentative_g_cost < g_cost.get(successor, math.inf):
+                    parent[successor] = current
+                    g_cost[successor] = tentative_g_cost
+                    h_cost = h(successor)
+                    open_list.push(successor, tentative_g_cost + h_cost, h_cost)
+                    if record: record(successor << 2 | PUSH)
+            if stats is not None: stats.expanded(len(successors), len(open_list))
+            if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed_set) is False:
+                return False, {}, len(closed_set)
+            yield len(closed_set)
+        return False, {}, len(closed_set)
+    finally:
+        if stats is not None: stats.end(open_list)
+
+def jps_search(draw_callback, grid, start_node, end_node, jump_table=None, trace=None, stats=None):
+    """ Jump Point Search; pass a jps_plus.JumpPointTable for the grid to answer jumps from JPS+ tables. """
+    return run_steps(jps_steps(draw_callback, grid, start_node, end_node, jump_table, trace, stats))
 
 # --- Theta* Implementation (MODIFIED to return metrics) ---
-def theta_star_search(draw_callback, grid, start_node, end_node, weight=1.0):
-    grid.reset_pathfinding_data()
-    open_set_heap = []
-    open_set_hash = {start_node}
+def theta_star_steps(draw_callback, grid, start_node, end_node, weight=1.0, lazy=False, trace=None, stats=None):
+    """ Generator form of theta_star_search: yields the number of cells expanded so far after each expansion. """
+    if stats is not None: stats.begin()
+    start, end = start_node.id, end_node.id
+    if not grid.reachable(start, end):
+        if stats is not None: stats.end()
+        return False, {}, 0
+    record = trace.events.append if trace is not None else None
+    terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+    g_cost = {start: 0}
+    parent = {start: None}
+    unverified = set()
+    open_list = OpenList()
     closed_set = set()
-    start_node.g_cost = 0
-    start_node.h_cost = _get_distance(start_node, end_node)
-    start_node.f_cost = start_node.g_cost + (start_node.h_cost * weight)
-    heapq.heappush(open_set_heap, (start_node.f_cost, start_node))
-    while open_set_heap:
-        if draw_callback:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: pygame.quit(); return False, {}, 0
-        _, current_node = heapq.heappop(open_set_heap)
-        open_set_hash.remove(current_node)
-        if current_node == end_node:
-            path = _reconstruct_path(end_node)
-            return True, path, len(closed_set)
-        closed_set.add(current_node)
-        for neighbor in grid.get_neighbors(current_node):
-            if neighbor in closed_set: continue
-            parent = current_node.parent
-            if parent is not None and grid.line_of_sight(parent, neighbor):
-                tentative_g_cost = parent.g_cost + _get_distance(parent, neighbor)
-                if tentative_g_cost < neighbor.g_cost:
-                    neighbor.parent = parent
-                    neighbor.g_cost = tentative_g_cost
-                    neighbor.h_cost = _get_distance(neighbor, end_node)
-                    neighbor.f_cost = neighbor.g_cost + (neighbor.h_cost * weight)
-                    if neighbor not in open_set_hash:
-                        heapq.heappush(open_set_heap, (neighbor.f_cost, neighbor))
-                        open_set_hash.add(neighbor)
-            else:
-                step_cost = _get_distance(current_node, neighbor) * neighbor.terrain_cost
-                tentative_g_cost = current_node.g_cost + step_cost
-                if tentative_g_cost < neighbor.g_cost:
-                    neighbor.parent = current_node
-                    neighbor.g_cost = tentative_g_cost
-                    neighbor.h_cost = _get_distance(neighbor, end_node)
-                    neighbor.f_cost = neighbor.g_cost + (neighbor.h_cost * weight)
-                    if neighbor not in open_set_hash:
-                        heapq.heappush(open_set_heap, (neighbor.f_cost, neighbor))
-                        open_set_hash.add(neighbor)
-        if draw_callback:
-            draw_callback(open_set=open_set_hash, closed_set=closed_set)
-    return False, {}, len(closed_set)
+    # Any-angle paths can beat octile distance, so only the Euclidean bound is admissible.
+    h = resolve_heuristic('euclidean').bind(grid, end)
+    start_h = h(start)
+    open_list.push(start, start_h * weight, start_h)
+    if record: record(start << 2 | PUSH)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_list:
+            current = open_list.pop()
+            if record: record(current << 2 | EXPAND)
+            if current in unverified:
+                # Lazy Theta*: check the assumed shortcut now, falling back to the best closed neighbor.
+                unverified.discard(current)
+                current_parent = parent[current]
+                line_cost = grid.line_cost(current_parent, current)
+                if stats is not None: stats.line_checks += 1
+                best_g = g_cost[current_parent] + line_cost if line_cost is not None else math.inf
+                enter_cost = terrain[current]
+                for offset, distance in moves[adjacency[current]]:
+                    neighbor = current + offset
+                    if neighbor in closed_set and g_cost[neighbor] + distance * enter_cost < best_g:
+                        best_g = g_cost[neighbor] + distance * enter_cost
+                        current_parent = neighbor
+                parent[current], g_cost[current] = current_parent, best_g
+            if current == end:
+                if stats is not None: stats.phase('path')
+                path = _reconstruct_path(grid, parent, end)
+                return True, path, len(closed_set)
+            closed_set.add(current)
+            current_parent = parent[current]
+            current_g = g_cost[current]
+            neighbors = moves[adjacency[current]]
+            for offset, distance in neighbors:
+                neighbor = current + offset
+                if neighbor in closed_set: continue
+                new_parent, tentative_g_cost = current, current_g + distance * terrain[neighbor]
+                if current_parent is not None:
+                    if lazy:
+                        shortcut_cost = _get_distance(grid, current_parent, neighbor) * terrain[neighbor]
+                    else:
+                        shortcut_cost = grid.line_cost(current_parent, neighbor)
+                        if stats is not None: stats.line_checks += 1
+                    if shortcut_cost is not None and g_cost[current_parent] + shortcut_cost < tentative_g_cost:
+                        new_parent, tentative_g_cost = current_parent, g_cost[current_parent] + shortcut_cost
+                if tentative_g_cost < g_cost.get(neighbor, math.inf):
+                    parent[neighbor] = new_parent
+                    g_cost[neighbor] = tentative_g_cost
+                    if lazy and new_parent != current:
+                        unverified.add(neighbor)
+                    else:
+                        unverified.discard(neighbor)
+                    h_cost = h(neighbor)
+                    open_list.push(neighbor, tentative_g_cost + h_cost * weight, h_cost)
+                    if record: record(neighbor << 2 | PUSH)
+            if stats is not None: stats.expanded(len(neighbors), len(open_list))
+            if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed_set) is False:
+                return False, {}, len(closed_set)
+            yield len(closed_set)
+        return False, {}, len(closed_set)
+    finally:
+        if stats is not None: stats.end(open_list)
+
+def theta_star_search(draw_callback, grid, start_node, end_node, weight=1.0, lazy=False, trace=None, stats=None):
+    """
+    Any-angle Theta*. Shortcuts are priced with grid.line_cost, so a straight line
+    pays the terrain of every cell it crosses instead of skipping swamps.
+
+    With lazy=True (Lazy Theta*) a neighbor is optimistically linked to the current
+    cell's parent without a line-of-sight check; the link is only verified, and
+    repaired from the best closed neighbor if needed, when the neighbor is expanded.
+    This trades one line check per generated neighbor for one per expansion.
+    """
+    return run_steps(theta_star_steps(draw_callback, grid, start_node, end_node, weight, lazy, trace, stats))
 
 # --- Bidirectional Search Implementation (MODIFIED to return metrics) ---
-# ... (_reconstruct_bidirectional_path is unchanged) ...
-def _reconstruct_bidirectional_path(meeting_node, start_node, end_node, parent_map_fwd, parent_map_bwd):
+def _reconstruct_bidirectional_path(grid, meeting, start, end, parent_map_fwd, parent_map_bwd):
     path_fwd = []
-    current = meeting_node
-    while current != start_node:
+    current = meeting
+    while current != start:
         path_fwd.append(current)
         current = parent_map_fwd[current]
-    path_fwd.append(start_node)
+    path_fwd.append(start)
     path_fwd.reverse()
     path_bwd = []
-    current = meeting_node
-    while current != end_node:
+    current = meeting
+    while current != end:
         path_bwd.append(current)
         current = parent_map_bwd[current]
-    path_bwd.append(end_node)
-    return path_fwd + path_bwd[1:]
-def bidirectional_search(draw_callback, grid, start_node, end_node, weight=1.0):
-    grid.reset_pathfinding_data()
-    open_set_fwd, closed_set_fwd = {start_node}, set()
-    g_cost_fwd = {node: float('inf') for row in grid.grid for node in row}
-    g_cost_fwd[start_node] = 0
+    path_bwd.append(end)
+    return [grid.node(cell) for cell in path_fwd + path_bwd[1:]]
+def bidirectional_steps(draw_callback, grid, start_node, end_node, weight=1.0, heuristic='octile', trace=None, stats=None):
+    """ Generator form of bidirectional_search: yields the number of cells expanded so far after each forward and backward expansion pair. """
+    if stats is not None: stats.begin()
+    start, end = start_node.id, end_node.id
+    if not grid.reachable(start, end):
+        if stats is not None: stats.end()
+        return False, {}, 0
+    record = trace.events.append if trace is not None else None
+    terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+    heuristic = resolve_heuristic(heuristic)
+    h_fwd = heuristic.bind(grid, end)
+    h_bwd = heuristic.bind(grid, start, reverse=True)
+    open_fwd, closed_set_fwd = OpenList(), set()
+    g_cost_fwd = {start: 0}
     parent_map_fwd = {}
-    open_set_bwd, closed_set_bwd = {end_node}, set()
-    g_cost_bwd = {node: float('inf') for row in grid.grid for node in row}
-    g_cost_bwd[end_node] = 0
+    open_bwd, closed_set_bwd = OpenList(), set()
+    g_cost_bwd = {end: 0}
     parent_map_bwd = {}
-    while open_set_fwd and open_set_bwd:
-        if draw_callback:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: pygame.quit(); return False, {}, 0
-        # Forward Step
-        current_fwd = min(open_set_fwd, key=lambda node: g_cost_fwd[node] + _heuristic(node, end_node) * weight)
-        open_set_fwd.remove(current_fwd)
-        closed_set_fwd.add(current_fwd)
-        if current_fwd in closed_set_bwd:
-            path = _reconstruct_bidirectional_path(current_fwd, start_node, end_node, parent_map_fwd, parent_map_bwd)
-            return True, path, len(closed_set_fwd) + len(closed_set_bwd)
-        for neighbor in grid.get_neighbors(current_fwd):
-            if neighbor in closed_set_fwd: continue
-            step_cost = _get_distance(current_fwd, neighbor) * neighbor.terrain_cost
-            tentative_g_cost = g_cost_fwd[current_fwd] + step_cost
-            if tentative_g_cost < g_cost_fwd[neighbor]:
-                parent_map_fwd[neighbor] = current_fwd
-                g_cost_fwd[neighbor] = tentative_g_cost
-                if neighbor not in open_set_fwd:
-                    open_set_fwd.add(neighbor)
-        # Backward Step
-        current_bwd = min(open_set_bwd, key=lambda node: g_cost_bwd[node] + _heuristic(node, start_node) * weight)
-        open_set_bwd.remove(current_bwd)
-        closed_set_bwd.add(current_bwd)
-        if current_bwd in closed_set_fwd:
-            path = _reconstruct_bidirectional_path(current_bwd, start_node, end_node, parent_map_fwd, parent_map_bwd)
-            return True, path, len(closed_set_fwd) + len(closed_set_bwd)
-        for neighbor in grid.get_neighbors(current_bwd):
-            if neighbor in closed_set_bwd: continue
-            step_cost = _get_distance(current_bwd, neighbor) * neighbor.terrain_cost
-            tentative_g_cost = g_cost_bwd[current_bwd] + step_cost
-            if tentative_g_cost < g_cost_bwd[neighbor]:
-                parent_map_bwd[neighbor] = current_bwd
-                g_cost_bwd[neighbor] = tentative_g_cost
-                if neighbor not in open_set_bwd:
-                    open_set_bwd.add(neighbor)
-        if draw_callback:
-            draw_callback(open_set_fwd, closed_set_fwd, open_set_bwd, closed_set_bwd)
-    return False, {}, len(closed_set_fwd) + len(closed_set_bwd)
\ No newline at end of file
+    start_h, end_h = h_fwd(start), h_bwd(end)
+    open_fwd.push(start, start_h * weight, start_h)
+    open_bwd.push(end, end_h * weight, end_h)
+    if record:
+        record(start << 2 | PUSH)
+        record(end << 2 | PUSH_BWD)
+    best_cost, meeting = (0, start) if start == end else (math.inf, None)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_fwd and open_bwd:
+            if best_cost <= max(open_fwd.min_f(), open_bwd.min_f()):
+                break
+            # Forward Step: edges are relaxed as stored, entering the neighbor's terrain
+            current_fwd = open_fwd.pop()
+            if record: record(current_fwd << 2 | EXPAND)
+            closed_set_fwd.add(current_fwd)
+            current_g = g_cost_fwd[current_fwd]
+            neighbors = moves[adjacency[current_fwd]]
+            for offset, distance in neighbors:
+                neighbor = current_fwd + offset
+                if neighbor in closed_set_fwd: continue
+                tentative_g_cost = current_g + distance * terrain[neighbor]
+                if tentative_g_cost < g_cost_fwd.get(neighbor, math.inf):
+                    parent_map_fwd[neighbor] = current_fwd
+                    g_cost_fwd[neighbor] = tentative_g_cost
+                    h_cost = h_fwd(neighbor)
+                    open_fwd.push(neighbor, tentative_g_cost + h_cost * weight, h_cost)
+                    if record: record(neighbor << 2 | PUSH)
+                    if neighbor in g_cost_bwd and tentative_g_cost + g_cost_bwd[neighbor] < best_cost:
+                        best_cost, meeting = tentative_g_cost + g_cost_bwd[neighbor], neighbor
+            if stats is not None: stats.expanded(len(neighbors), len(open_fwd) + len(open_bwd))
+            if best_cost <= max(open_fwd.min_f(), open_bwd.min_f()):
+                break
+            # Backward Step: edges are walked in reverse, so a step pays the terrain of the cell it leaves
+            current_bwd = open_bwd.pop()
+            if record: record(current_bwd << 2 | EXPAND_BWD)
+            closed_set_bwd.add(current_bwd)
+            current_g = g_cost_bwd[current_bwd]
+            leave_cost = terrain[current_bwd]
+            neighbors = moves[adjacency[current_bwd]]
+            for offset, distance in neighbors:
+                neighbor = current_bwd + offset
+                if neighbor in closed_set_bwd: continue
+                tentative_g_cost = current_g + distance * leave_cost
+                if tentative_g_cost < g_cost_bwd.get(neighbor, math.inf):
+                    parent_map_bwd[neighbor] = current_bwd
+                    g_cost_bwd[neighbor] = tentative_g_cost
+                    h_cost = h_bwd(neighbor)
+                    open_bwd.push(neighbor, tentative_g_cost + h_cost * weight, h_cost)
+                    if record: record(neighbor << 2 | PUSH_BWD)
+                    if neighbor in g_cost_fwd and tentative_g_cost + g_cost_fwd[neighbor] < best_cost:
+                        best_cost, meeting = tentative_g_cost + g_cost_fwd[neighbor], neighbor
+            if stats is not None: stats.expanded(len(neighbors), len(open_fwd) + len(open_bwd))
+            if draw_callback and draw_callback(open_fwd.entries, closed_set_fwd, open_bwd.entries, closed_set_bwd) is False:
+                return False, {}, len(closed_set_fwd) + len(closed_set_bwd)
+            yield len(closed_set_fwd) + len(closed_set_bwd)
+        if meeting is None:
+            return False, {}, len(closed_set_fwd) + len(closed_set_bwd)
+        if stats is not None: stats.phase('path')
+        path = _reconstruct_bidirectional_path(grid, meeting, start, end, parent_map_fwd, parent_map_bwd)
+        return True, path, len(closed_set_fwd) + len(closed_set_bwd)
+    finally:
+        if stats is not None: stats.end(open_fwd, open_bwd)
+
+def bidirectional_search(draw_callback, grid, start_node, end_node, weight=1.0, heuristic='octile', trace=None, stats=None):
+    """
+    Bidirectional A* with one open list per direction. Cost maps are filled lazily
+    and the search stops once the best meeting cost found so far is no larger than
+    the lowest f-cost left on either frontier, so the returned path is optimal
+    whenever the heuristic is consistent.
+    """
+    return run_steps(bidirectional_steps(draw_callback, grid, start_node, end_node, weight, heuristic, trace, stats))
+
+# --- Multi-Goal Search ---
+def multi_goal_steps(draw_callback, grid, start_node, end_nodes, k=1, trace=None, stats=None):
+    """ Generator form of k_nearest_goals_search: yields the number of cells expanded so far after each expansion. """
+    if stats is not None: stats.begin()
+    start = start_node.id
+    goals = {node.id for node in end_nodes}
+    goals = {goal for goal in goals if grid.reachable(start, goal)}
+    if not goals or k < 1:
+        if stats is not None: stats.end()
+        return False, [], 0
+    record = trace.events.append if trace is not None else None
+    terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+    h = NearestGoalIndex(grid, goals)
+    g_cost = {start: 0}
+    parent = {start: None}
+    open_list = OpenList()
+    closed_set = set()
+    paths = []
+    start_h = h(start)
+    open_list.push(start, start_h, start_h)
+    if record: record(start << 2 | PUSH)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_list:
+            current = open_list.pop()
+            if record: record(current << 2 | EXPAND)
+            if current in goals:
+                if stats is not None: stats.phase('path')
+                paths.append(_reconstruct_path(grid, parent, current))
+                if len(paths) == k or len(goals) == 1:
+                    return True, paths, len(closed_set)
+                if stats is not None: stats.phase('search')
+                # The nearest remaining goal is farther away, so every estimate may
+                # have grown: re-key the open list, then keep expanding through this goal.
+                goals.discard(current)
+                h.discard(current)
+                for cell in list(open_list.entries):
+                    h_cost = h(cell)
+                    open_list.push(cell, g_cost[cell] + h_cost, h_cost)
+            current_g = g_cost[current]
+            neighbors = moves[adjacency[current]]
+            for offset, distance in neighbors:
+                neighbor = current + offset
+                if neighbor in closed_set:
+                    continue
+                tentative_g_cost = current_g + distance * terrain[neighbor]
+                if tentative_g_cost < g_cost.get(neighbor, math.inf):
+                    parent[neighbor] = current
+                    g_cost[neighbor] = tentative_g_cost
+                    h_cost = h(neighbor)
+                    open_list.push(neighbor, tentative_g_cost + h_cost, h_cost)
+                    if record: record(neighbor << 2 | PUSH)
+            closed_set.add(current)
+            if stats is not None: stats.expanded(len(neighbors), len(open_list))
+            if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed_set) is False:
+                return False, [], len(closed_set)
+            yield len(closed_set)
+        return bool(paths), paths, len(closed_set)
+    finally:
+        if stats is not None: stats.end(open_list)
+
+def k_nearest_goals_search(draw_callback, grid, start_node, end_nodes, k, trace=None, stats=None):
+    """
+    Paths to the `k` cheapest-to-reach of several goal nodes, nearest first, from
+    one A* search: the heuristic is the octile distance to the nearest goal not yet
+    reached (heuristics.NearestGoalIndex), so a single frontier serves every goal.
+    Returns (found, paths, explored) with fewer than k paths if fewer goals are
+    reachable. Goals in another connected component are dropped up front.
+    """
+    return run_steps(multi_goal_steps(draw_callback, grid, start_node, end_nodes, k, trace, stats))
+
+def nearest_goal_steps(draw_callback, grid, start_node, end_nodes, trace=None, stats=None):
+    found, paths, explored = yield from multi_goal_steps(draw_callback, grid, start_node, end_nodes, 1, trace, stats)
+    return found, paths[0] if found else {}, explored
+
+def nearest_goal_search(draw_callback, grid, start_node, end_nodes, trace=None, stats=None):
+    """ Path to the cheapest-to-reach of several goal nodes; see k_nearest_goals_search. """
+    return run_steps(nearest_goal_steps(draw_callback, grid, start_node, end_nodes, trace, stats))
+
+# Generator form of every search, keyed by the search function.
+SEARCH_STEPS = {
+    a_star_search: a_star_steps,
+    dijkstra_search: dijkstra_steps,
+    weighted_a_star_search: weighted_a_star_steps,
+    jps_search: jps_steps,
+    theta_star_search: theta_star_steps,
+    bidirectional_search: bidirectional_steps,
+    nearest_goal_search: nearest_goal_steps,
+    k_nearest_goals_search: multi_goal_steps,
+}
@@ -0,0 +1,181 @@
+import math
+import time
+from collections import namedtuple
+
+from algorithms import path_cost
+from open_list import OpenList
+from heuristics import resolve_heuristic
+from search_trace import EXPAND, PUSH
+
+Solution = namedtuple('Solution', 'weight bound cost expansions seconds')
+Solution.__doc__ = """
+One completed ARA* iteration: the heuristic weight it ran at, the proven
+suboptimality bound of its path (cost <= bound * optimal cost), the path cost,
+and the expansions and seconds spent so far over all iterations.
+"""
+
+class AnytimeAStar:
+    """
+    Anytime Repairing A* (ARA*) between a fixed start and goal.
+
+    The first iteration is weighted A* at `initial_weight`, which finds a path
+    quickly. Each later iteration lowers the weight by `weight_step` (down to 1.0)
+    and reuses everything the previous ones computed: g-costs and parents are kept,
+    cells whose cost dropped after they were expanded wait in `incons` instead of
+    being re-expanded within the same iteration, and between iterations they move
+    back to the open list, which is re-keyed for the new weight. Later iterations
+    therefore continue from the previous search tree instead of starting over.
+
+    After each iteration `bound` is the proven suboptimality of the current path:
+    min(weight, cost / the lowest g + h over the open and inconsistent cells).
+    The search is `done` once the bound reaches 1.0 (the path is optimal) or the
+    goal is found unreachable. `solutions` lists every completed iteration.
+    """
+    def __init__(self, grid, start, goal, initial_weight=3.0, weight_step=0.5, heuristic='octile'):
+        if initial_weight < 1.0:
+            raise ValueError("initial_weight must be at least 1.0")
+        if weight_step <= 0:
+            raise ValueError("weight_step must be positive")
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.weight = initial_weight
+        self.weight_step = weight_step
+        self._h = resolve_heuristic(heuristic).bind(grid, goal)
+        self.g = {start: 0.0}
+        self.parent = {start: None}
+        self.open_list = OpenList()
+        self.closed = set()
+        self.incons = set()
+        self.bound = math.inf
+        self.cost = math.inf
+        self.done = False
+        self.cancelled = False
+        self.expansions = 0
+        self.solutions = []
+        self._elapsed = 0.0
+        start_h = self._h(start)
+        self.open_list.push(start, start_h * initial_weight, start_h)
+
+    def path(self):
+        """ Cells of the best path found so far, or None. """
+        if self.goal not in self.parent:
+            return None
+        cells = []
+        cell = self.goal
+        while cell is not None:
+            cells.append(cell)
+            cell = self.parent[cell]
+        return cells[::-1]
+
+    def run(self, deadline=None, draw_callback=None, trace=None, stats=None):
+        """
+        Runs iterations until the path is optimal or time.perf_counter() reaches
+        `deadline`, and returns the best path so far (cells) or None. Can be called
+        again with a later deadline to keep improving. A draw_callback returning
+        False cancels the search, which then reports no path.
+        """
+        if stats is not None: stats.begin()
+        record = trace.events.append if trace is not None else None
+        started = time.perf_counter()
+        if not self.done and not self.grid.reachable(self.start, self.goal):
+            self.done = True
+        if stats is not None: stats.phase('search')
+        try:
+            while not self.done:
+                if not self._improve(deadline, draw_callback, record, stats):
+                    break
+                self._finish_iteration(started)
+                if not self.done:
+                    if stats is not None: stats.phase('rekey')
+                    self._lower_weight(record)
+                    if stats is not None: stats.phase('search')
+            if self.cancelled:
+                return None
+            if stats is not None: stats.phase('path')
+            # The tree may have improved past the last completed iteration; its path is never worse.
+            cells = self.path()
+            if cells is not None:
+                self.cost = min(self.cost, path_cost(self.grid, cells))
+            return cells
+        finally:
+            self._elapsed += time.perf_counter() - started
+            if stats is not None: stats.end(self.open_list)
+
+    # --- Core ---
+    def _improve(self, deadline, draw_callback, record, stats):
+        """ One ARA* ImprovePath at the current weight; False if stopped by the deadline or the callback. """
+        grid, g, parent, h, weight = self.grid, self.g, self.parent, self._h, self.weight
+        terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+        open_list, closed, incons, goal = self.open_list, self.closed, self.incons, self.goal
+        clock = time.perf_counter
+        while open_list and g.get(goal, math.inf) > open_list.min_f():
+            if deadline is not None and clock() >= deadline:
+                return False
+            current = open_list.pop()
+            if record: record(current << 2 | EXPAND)
+            closed.add(current)
+            self.expansions += 1
+            current_g = g[current]
+            neighbors = moves[adjacency[current]]
+            for offset, distance in neighbors:
+                neighbor = current + offset
+                tentative_g_cost = current_g + distance * terrain[neighbor]
+                if tentative_g_cost < g.get(neighbor, math.inf):
+                    g[neighbor] = tentative_g_cost
+                    parent[neighbor] = current
+                    if neighbor in closed:
+                        incons.add(neighbor)
+                    else:
+                        h_cost = h(neighbor)
+                        open_list.push(neighbor, tentative_g_cost + h_cost * weight, h_cost)
+                        if record: record(neighbor << 2 | PUSH)
+            if stats is not None: stats.expanded(len(neighbors), len(open_list))
+            if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed) is False:
+                self.cancelled = self.done = True
+                return False
+        return True
+
+    def _finish_iteration(self, started):
+        g, h = self.g, self._h
+        cost = g.get(self.goal, math.inf)
+        if cost == math.inf:
+            # The open list ran dry without reaching the goal.
+            self.done = True
+            return
+        lower = min((g[cell] + h(cell) for cell in (*self.open_list.entries, *self.incons)), default=cost)
+        lower = min(lower, cost)
+        self.bound = min(self.weight, cost / lower) if lower > 0 else 1.0
+        self.cost = cost
+        seconds = self._elapsed + time.perf_counter() - started
+        self.solutions.append(Solution(self.weight, self.bound, cost, self.expansions, seconds))
+        self.done = self.bound <= 1.0
+
+    def _lower_weight(self, record):
+        self.weight = weight = max(1.0, self.weight - self.weight_step)
+        g, h, open_list = self.g, self._h, self.open_list
+        cells = set(open_list.entries)
+        cells.update(self.incons)
+        self.incons.clear()
+        self.closed.clear()
+        open_list.clear()
+        for cell in cells:
+            h_cost = h(cell)
+            open_list.push(cell, g[cell] + h_cost * weight, h_cost)
+            if record: record(cell << 2 | PUSH)
+
+def ara_star_search(draw_callback, grid, start_node, end_node, initial_weight=3.0, weight_step=0.5, time_limit=None,
+                    heuristic='octile', trace=None, stats=None):
+    """
+    Anytime weighted A* (ARA*): a fast first path at `initial_weight`, then
+    tighter weights reusing the earlier work, until the path is optimal or
+    `time_limit` seconds have passed (None: no limit). Returns the best path found
+    by then; `explored` counts the expansions of all iterations. Use AnytimeAStar
+    directly to read the suboptimality bound or to keep improving later.
+    """
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    planner = AnytimeAStar(grid, start_node.id, end_node.id, initial_weight, weight_step, heuristic)
+    cells = planner.run(deadline, draw_callback, trace, stats)
+    if cells is None:
+        return False, {}, planner.expansions
+    return True, [grid.node(cell) for cell in cells], planner.expansions
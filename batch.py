@@ -0,0 +1,135 @@
+import time
+from collections import namedtuple
+from numbers import Integral
+from multiprocessing import Pool, shared_memory
+
+from grid import Grid
+from algorithms import a_star_search, dijkstra_search, weighted_a_star_search, jps_search, theta_star_search, bidirectional_search
+from hpa import hpa_star_search, HierarchicalGrid
+from incremental import d_star_lite_search
+from anytime import ara_star_search
+from jps_plus import JumpPointTable
+from heuristics import LandmarkHeuristic
+
+# Every search by name, all with the (draw_callback, grid, start_node, end_node) signature.
+ALGORITHMS = {
+    'a_star': a_star_search,
+    'dijkstra': dijkstra_search,
+    'weighted_a_star': weighted_a_star_search,
+    'jps': jps_search,
+    'jps_plus': jps_search,
+    'theta_star': theta_star_search,
+    'bidirectional': bidirectional_search,
+    'alt': a_star_search,
+    'hpa': hpa_star_search,
+    'd_star_lite': d_star_lite_search,
+    'ara_star': ara_star_search,
+}
+
+# Searches that take a preprocessed structure: name -> (keyword, factory(grid)).
+# A worker builds each structure once, on the first query that needs it.
+PREPROCESSING = {
+    'jps_plus': ('jump_table', JumpPointTable),
+    'alt': ('heuristic', LandmarkHeuristic),
+    'hpa': ('hierarchy', HierarchicalGrid),
+}
+
+BatchResult = namedtuple('BatchResult', 'index start goal algorithm found path explored time_ms')
+BatchResult.__doc__ = """
+One answered query. `path` lists cell ids (empty when not found) and `time_ms`
+is the wall time of the search call inside the worker.
+"""
+
+class SharedGrid:
+    """
+    Snapshot of a grid's obstacle, adjacency and terrain buffers in one shared
+    memory block, laid out as [obstacles | adjacency | terrain] with the float32
+    terrain aligned to 4 bytes. Workers attach by name and wrap the block with
+    Grid.from_buffers, so the grid is never pickled. Use as a context manager;
+    the block is released on exit.
+    """
+    def __init__(self, grid):
+        size = grid.size
+        self.rows, self.cols = grid.rows, grid.cols
+        self._terrain_offset = (2 * size + 3) & ~3
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, self._terrain_offset + 4 * size))
+        buf = self.shm.buf
+        buf[:size] = grid.obstacles
+        buf[size:2 * size] = grid.adjacency
+        buf[self._terrain_offset:self._terrain_offset + 4 * size] = memoryview(grid.terrain).cast('B')
+
+    def descriptor(self):
+        """ Everything a worker needs to attach: (block name, rows, cols). """
+        return self.shm.name, self.rows, self.cols
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_grid(descriptor):
+    """ Returns (grid, shared memory handle) for a SharedGrid descriptor; keep the handle alive. """
+    name, rows, cols = descriptor
+    # Pool workers share the creating process's resource tracker, so registering the
+    # block again here is harmless and the creator's unlink clears it once.
+    shm = shared_memory.SharedMemory(name=name)
+    size = rows * cols
+    terrain_offset = (2 * size + 3) & ~3
+    buf = shm.buf
+    grid = Grid.from_buffers(rows, cols, buf[:size], buf[terrain_offset:terrain_offset + 4 * size], buf[size:2 * size])
+    return grid, shm
+
+# --- Worker side ---
+_worker = {}
+
+def _init_worker(descriptor):
+    _worker['grid'], _worker['shm'] = attach_grid(descriptor)
+    _worker['prepared'] = {}
+
+def _run_query(item):
+    index, (start, goal, algorithm) = item
+    grid = _worker['grid']
+    kwargs = {}
+    if algorithm in PREPROCESSING:
+        keyword, factory = PREPROCESSING[algorithm]
+        prepared = _worker['prepared']
+        if algorithm not in prepared:
+            prepared[algorithm] = factory(grid)
+        kwargs[keyword] = prepared[algorithm]
+    started = time.perf_counter()
+    found, path, explored = ALGORITHMS[algorithm](None, grid, grid.node(start), grid.node(goal), **kwargs)
+    elapsed = (time.perf_counter() - started) * 1000
+    cells = [node.id for node in path] if found else []
+    return BatchResult(index, start, goal, algorithm, found, cells, explored, elapsed)
+
+# --- Public API ---
+def _normalize(grid, query, default_algorithm):
+    if len(query) == 2:
+        (start, goal), algorithm = query, default_algorithm
+    else:
+        start, goal, algorithm = query
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}; expected one of {sorted(ALGORITHMS)}")
+    # Cells may be given as ids (numpy integers included) or as (row, col) pairs.
+    start = int(start) if isinstance(start, Integral) else grid.cell_id(*start)
+    goal = int(goal) if isinstance(goal, Integral) else grid.cell_id(*goal)
+    return start, goal, algorithm
+
+def run_batch(grid, queries, processes=None, algorithm='a_star', chunksize=16):
+    """
+    Answers many (start, goal[, algorithm]) queries on a process pool and yields a
+    BatchResult per query in completion order; `index` gives the query's position.
+
+    The grid is snapshotted into shared memory when iteration starts, so edits made
+    while the batch runs are not seen by the workers. Workers treat the grid as read
+    only. Leaving the loop early terminates the pool and releases the block.
+    """
+    queries = [_normalize(grid, query, algorithm) for query in queries]
+    with SharedGrid(grid) as shared:
+        with Pool(processes, initializer=_init_worker, initargs=(shared.descriptor(),)) as pool:
+            yield from pool.imap_unordered(_run_query, enumerate(queries), chunksize)
@@ -0,0 +1,281 @@
+"""
+Headless benchmark suite.
+
+Runs the searches over a corpus of seeded maps (random obstacles with terrain
+patches, and mazes) at several sizes plus any MovingAI scenario files, and reports
+per map and algorithm: median / p90 / p99 query time over repeated runs after
+warmup, nodes expanded, total path cost, paths found, peak traced memory and the
+search counters of stats.SearchStats. Each map also reports how many of its
+queries are reachable at all, from the grid's connected-component labels.
+
+    python benchmark.py --sizes 64 128 --queries 20 --repeat 5 --json results.json
+    python benchmark.py --scen maps/arena.map.scen --algorithms a_star jps_plus
+    python benchmark.py --json new.json --baseline results.json   # exit 1 on regressions
+    python benchmark.py --sizes 1000 --algorithms a_star --queries 1 --agents 500   # multi-agent throughput
+    python benchmark.py --kinds random --sizes 30 --seeds 0 1 2 --algorithms a_star --agents 200   # dense crowd
+
+Multi-agent runs also count agents that shared a cell or swapped places; any
+such conflict makes the tool exit 1.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import map_generators
+from grid import Grid
+from algorithms import path_cost
+from batch import ALGORITHMS, PREPROCESSING
+from map_io import load_movingai_map, load_movingai_scenarios
+from multi_agent import MultiAgentPlanner
+from stats import SearchStats
+
+FIELDS = ['map', 'size', 'algorithm', 'queries', 'reachable', 'found', 'median_ms', 'p90_ms', 'p99_ms', 'mean_ms',
+          'expanded', 'path_cost', 'peak_kb', 'prep_ms', 'generated', 'pushes', 'stale_pops', 'peak_open']
+
+# --- Corpus ---
+def random_map(size, seed, density=0.25):
+    """ Random obstacles plus swamp and road patches, reproducible from `seed`. """
+    rng = np.random.default_rng(seed)
+    grid = Grid(size, size)
+    roll = rng.random((size, size))
+    grid.obstacle_array()[:] = roll < density
+    terrain = grid.terrain_array()
+    terrain[(roll >= density) & (roll < density + 0.1)] = 5.0
+    terrain[(roll >= density + 0.1) & (roll < density + 0.2)] = 0.5
+    grid.refresh()
+    return grid
+
+def maze_map(size, seed):
+    """ Perfect maze from the recursive backtracker, reproducible from `seed`. """
+    return map_generators.maze(size, size, seed=seed, algorithm='backtracker')
+
+def rooms_map(size, seed):
+    """ Rooms and corridors with swamp and road noise patches, reproducible from `seed`. """
+    return map_generators.add_terrain_noise(map_generators.rooms_and_corridors(size, size, seed=seed), seed=seed)
+
+MAP_KINDS = {'random': random_map, 'maze': maze_map, 'rooms': rooms_map}
+
+def random_queries(grid, count, seed):
+    """ `count` (start, goal) cell pairs drawn from the walkable cells. """
+    rng = np.random.default_rng(seed)
+    walkable = np.flatnonzero(grid.obstacle_array().ravel() == 0)
+    if walkable.size == 0:
+        return []
+    pairs = rng.choice(walkable, size=(count, 2))
+    return [(int(start), int(goal)) for start, goal in pairs]
+
+def build_corpus(args):
+    """ Yields (map name, grid, queries). """
+    for kind in args.kinds:
+        for size in args.sizes:
+            for seed in args.seeds:
+                grid = MAP_KINDS[kind](size, seed)
+                yield f"{kind}-{size}-s{seed}", grid, random_queries(grid, args.queries, seed)
+    for scen_path in args.scen or ():
+        scenarios = load_movingai_scenarios(scen_path)
+        by_map = {}
+        for scenario in scenarios:
+            by_map.setdefault(scenario.map, []).append(scenario)
+        for map_name, group in by_map.items():
+            map_path = os.path.join(args.map_dir or os.path.dirname(scen_path), os.path.basename(map_name))
+            grid = load_movingai_map(map_path)
+            group = group[:args.queries] if args.queries else group
+            queries = [(grid.cell_id(*s.start), grid.cell_id(*s.goal)) for s in group]
+            yield os.path.basename(map_name), grid, queries
+
+# --- Measurement ---
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def measure(grid, queries, name, repeat, warmup):
+    """ Benchmarks one algorithm on one map and returns its result record (without map fields). """
+    search = ALGORITHMS[name]
+    nodes = [(grid.node(start), grid.node(goal)) for start, goal in queries]
+    kwargs, prepared, prep_ms = {}, None, 0.0
+    if name in PREPROCESSING:
+        # Some structures build lazily, so preprocessing time covers the factory
+        # call plus one search.
+        keyword, factory = PREPROCESSING[name]
+        started = time.perf_counter()
+        prepared = kwargs[keyword] = factory(grid)
+        if nodes:
+            search(None, grid, *nodes[0], **kwargs)
+        prep_ms = (time.perf_counter() - started) * 1000
+    timings, expanded, cost, found = [], 0, 0.0, 0
+    for start_node, end_node in nodes:
+        for _ in range(warmup):
+            search(None, grid, start_node, end_node, **kwargs)
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ok, path, explored = search(None, grid, start_node, end_node, **kwargs)
+            runs.append((time.perf_counter() - started) * 1000)
+        timings.append(statistics.median(runs))
+        expanded += explored
+        if ok:
+            found += 1
+            cost += path_cost(grid, path)
+    # Peak memory and counters come from a separate pass: tracemalloc slows allocation down.
+    stats = SearchStats()
+    tracemalloc.start()
+    for start_node, end_node in nodes:
+        search(None, grid, start_node, end_node, stats=stats, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if prepared is not None:
+        prepared.close()
+    return {
+        'algorithm': name,
+        'queries': len(queries),
+        'found': found,
+        'median_ms': _percentile(timings, 50),
+        'p90_ms': _percentile(timings, 90),
+        'p99_ms': _percentile(timings, 99),
+        'mean_ms': statistics.fmean(timings) if timings else 0.0,
+        'expanded': expanded,
+        'path_cost': round(cost, 6),
+        'peak_kb': peak / 1024,
+        'prep_ms': prep_ms,
+        'generated': stats.generated,
+        'pushes': stats.pushes,
+        'stale_pops': stats.stale_pops,
+        'peak_open': stats.peak_open,
+    }
+
+def measure_agents(grid, count, seed, window, steps):
+    """
+    Runs MultiAgentPlanner for `steps` steps with up to `count` agents between
+    random walkable cells (pairs in different components are skipped).
+    """
+    rng = np.random.default_rng(seed)
+    walkable = np.flatnonzero(grid.obstacle_array().ravel() == 0)
+    planner = MultiAgentPlanner(grid, window=window)
+    if walkable.size >= 2:
+        cells = rng.choice(walkable, size=min(2 * count, walkable.size // 2 * 2), replace=False).tolist()
+        half = len(cells) // 2
+        for start, goal in zip(cells[:half], cells[half:]):
+            if grid.reachable(start, goal):
+                planner.add_agent(start, goal)
+    planner.run(steps)
+    return {
+        'agents': len(planner.agents),
+        'agents_per_second': planner.agents_per_second,
+        'arrived': sum(agent.arrived for agent in planner.agents),
+        'failed_plans': planner.failed_plans,
+        'conflicts': planner.conflicts,
+    }
+
+def run_suite(args, log=print):
+    """ Returns the per-algorithm records and the multi-agent results (with their map names). """
+    records, agent_records = [], []
+    for map_name, grid, queries in build_corpus(args):
+        # Labelling here also keeps the one-off component pass out of the timings.
+        reachable = sum(grid.reachable(start, goal) for start, goal in queries)
+        for name in args.algorithms:
+            record = {'map': map_name, 'size': f"{grid.rows}x{grid.cols}", 'reachable': reachable}
+            record.update(measure(grid, queries, name, args.repeat, args.warmup))
+            records.append(record)
+            log(f"{map_name:<22} {name:<16} median {record['median_ms']:9.3f} ms  p90 {record['p90_ms']:9.3f} ms  "
+                f"expanded {record['expanded']:>9}  found {record['found']:>4}/{reachable:<4} "
+                f"cost {record['path_cost']:12.3f}  peak {record['peak_kb']:9.1f} KiB")
+        if args.agents:
+            result = measure_agents(grid, args.agents, args.seeds[0], args.agent_window, args.agent_steps)
+            agent_records.append({'map': map_name, **result})
+            log(f"{map_name:<22} {'multi_agent':<16} {result['agents']} agents  {result['agents_per_second']:9.0f} agents/s  "
+                f"arrived {result['arrived']} in {args.agent_steps} steps  failed plans {result['failed_plans']}  "
+                f"conflicts {result['conflicts']}")
+    return records, agent_records
+
+# --- Output and baselines ---
+def write_json(records, path, args):
+    meta = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': records}, f, indent=2)
+
+def write_csv(records, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+def compare(records, baseline_path, tolerance):
+    """
+    Returns a list of regression messages against a JSON file written by this tool;
+    only records for the same map, algorithm and query count are compared.
+    Time regresses when the median grows by more than `tolerance` (a fraction);
+    nodes expanded, path cost and paths found are deterministic and must not get worse.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['map'], r['algorithm']): r for r in json.load(f)['results']}
+    regressions = []
+    for record in records:
+        old = baseline.get((record['map'], record['algorithm']))
+        if old is None or old['queries'] != record['queries']:
+            continue
+        label = f"{record['map']} / {record['algorithm']}"
+        if record['median_ms'] > old['median_ms'] * (1 + tolerance):
+            regressions.append(f"{label}: median {old['median_ms']:.3f} -> {record['median_ms']:.3f} ms")
+        if record['found'] < old['found']:
+            regressions.append(f"{label}: found {old['found']} -> {record['found']}")
+        elif record['found'] == old['found'] and record['path_cost'] > old['path_cost'] + 1e-6:
+            regressions.append(f"{label}: path cost {old['path_cost']:.3f} -> {record['path_cost']:.3f}")
+        if record['expanded'] > old['expanded']:
+            regressions.append(f"{label}: expanded {old['expanded']} -> {record['expanded']}")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless pathfinding benchmark.")
+    parser.add_argument('--algorithms', nargs='+', default=sorted(ALGORITHMS), choices=sorted(ALGORITHMS))
+    parser.add_argument('--kinds', nargs='*', default=sorted(MAP_KINDS), choices=sorted(MAP_KINDS),
+                        help="seeded map kinds to generate (none to run scenario files only)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[64, 128])
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--queries', type=int, default=10, help="queries per map (scenario files: first N, 0 = all)")
+    parser.add_argument('--scen', nargs='*', help="MovingAI .scen files")
+    parser.add_argument('--map-dir', help="directory of the .map files named in --scen (default: next to the .scen)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per query")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed runs per query")
+    parser.add_argument('--json', help="write results as JSON")
+    parser.add_argument('--csv', help="write results as CSV")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed median time growth (fraction)")
+    parser.add_argument('--agents', type=int, default=0, help="also run the multi-agent planner with this many agents per map")
+    parser.add_argument('--agent-window', type=int, default=16, help="multi-agent planning window (steps)")
+    parser.add_argument('--agent-steps', type=int, default=32, help="multi-agent steps to simulate")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    records, agent_records = run_suite(args)
+    conflicts = [f"{r['map']} / multi_agent: {r['conflicts']} conflicts" for r in agent_records if r['conflicts']]
+    for message in conflicts:
+        print(f"REGRESSION {message}")
+    if args.json:
+        write_json(records, args.json, args)
+    if args.csv:
+        write_csv(records, args.csv)
+    if args.baseline:
+        regressions = compare(records, args.baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 1 if conflicts else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
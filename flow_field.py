@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+
+from grid import DIRECTIONS
+
+def distance_field(grid, sources, to_sources=True):
+    """
+    Cheapest cost between every cell and the nearest of `sources` (cell ids), as a
+    flat float64 array with infinity for unreachable cells and obstacles.
+
+    With to_sources=True each entry is the cost of travelling from the cell to a
+    source (a cost-to-go field: each step pays the terrain of the cell it enters);
+    with to_sources=False it is the cost of travelling from a source to the cell.
+
+    The field is grown as a vectorized bucketed wavefront (Dial's algorithm): bucket
+    k holds the cells whose cost lies in [k * width, (k + 1) * width) with width the
+    cheapest possible step, so every relaxation out of bucket k lands in a later
+    bucket and a whole bucket can be settled and relaxed at once with array
+    operations. The number of Python-level iterations grows with the cost range,
+    not with the number of cells, which suits open maps; on mazes the wavefront is
+    only a few cells wide and heuristics.distance_table's heap search is faster.
+    """
+    size = grid.size
+    terrain = np.frombuffer(grid.terrain, dtype=np.float32).astype(np.float64)
+    adjacency = np.frombuffer(grid.adjacency, dtype=np.uint8)
+    obstacles = np.frombuffer(grid.obstacles, dtype=np.uint8)
+    offsets = np.array([dr * grid.cols + dc for dr, dc in DIRECTIONS], dtype=np.int64)
+    distances = np.array([math.sqrt(dr * dr + dc * dc) for dr, dc in DIRECTIONS])
+    bits = np.arange(8, dtype=np.uint8)
+    dist = np.full(size, np.inf)
+    settled = np.zeros(size, dtype=bool)
+    seeds = np.unique(np.asarray(list(sources), dtype=np.int64))
+    seeds = seeds[obstacles[seeds] == 0]
+    dist[seeds] = 0.0
+    width = grid.min_terrain_cost()
+    if width <= 0:
+        raise ValueError("distance_field needs positive terrain costs")
+    buckets = {0: [seeds]} if seeds.size else {}
+    while buckets:
+        key = min(buckets)
+        cells = np.unique(np.concatenate(buckets.pop(key)))
+        cells = cells[~settled[cells]]
+        if not cells.size:
+            continue
+        settled[cells] = True
+        # All 8 directions at once: one row per cell, one column per direction.
+        valid = (adjacency[cells][:, None] >> bits) & 1 == 1
+        targets = (cells[:, None] + offsets)[valid]
+        from_cells = np.broadcast_to(cells[:, None], valid.shape)[valid]
+        # Moving from target onto from_cell pays from_cell's terrain, and the reverse.
+        step = terrain[from_cells] if to_sources else terrain[targets]
+        cost = dist[from_cells] + np.broadcast_to(distances, valid.shape)[valid] * step
+        better = (cost < dist[targets]) & ~settled[targets]
+        if not better.any():
+            continue
+        targets = targets[better]
+        np.minimum.at(dist, targets, cost[better])
+        improved = np.unique(targets)
+        # Rounding must never drop a cell into the bucket being processed.
+        keys = np.maximum(np.floor(dist[improved] / width).astype(np.int64), key + 1)
+        order = np.argsort(keys, kind='stable')
+        keys, improved = keys[order], improved[order]
+        splits = np.flatnonzero(np.diff(keys)) + 1
+        for bucket, group in zip(keys[np.r_[0, splits]].tolist(), np.split(improved, splits)):
+            buckets.setdefault(bucket, []).append(group)
+    return dist
+
+class FlowField:
+    """
+    Shared navigation field toward a set of goals: `distance` is the cost-to-go of
+    every cell (see distance_field) and `direction` the index into grid.DIRECTIONS
+    of the cheapest next step, or -1 at goals, obstacles and unreachable cells.
+
+    One field serves any number of agents heading to the same goals; each reads its
+    route with path() in time proportional to the path length, without a search.
+    The field is a snapshot: rebuild it after the grid changes.
+    """
+    def __init__(self, grid, goals):
+        self.grid = grid
+        self.goals = list(goals)
+        self.distance = distance_field(grid, self.goals)
+        self.direction = self._directions()
+
+    def _directions(self):
+        grid = self.grid
+        terrain = np.frombuffer(grid.terrain, dtype=np.float32).astype(np.float64)
+        adjacency = np.frombuffer(grid.adjacency, dtype=np.uint8)
+        cells = np.arange(grid.size)
+        best = np.full(grid.size, np.inf)
+        direction = np.full(grid.size, -1, dtype=np.int8)
+        for i, (dr, dc) in enumerate(DIRECTIONS):
+            valid = cells[(adjacency >> i) & 1 == 1]
+            neighbors = valid + dr * grid.cols + dc
+            cost = self.distance[neighbors] + math.sqrt(dr * dr + dc * dc) * terrain[neighbors]
+            better = cost < best[valid]
+            best[valid[better]] = cost[better]
+            direction[valid[better]] = i
+        # Goals stay put; obstacles and cells that cannot reach a goal have no direction.
+        direction[(self.distance == 0) | ~np.isfinite(self.distance)] = -1
+        return direction
+
+    def cost(self, cell):
+        """ Cost-to-go from a cell; infinity if no goal is reachable. """
+        return float(self.distance[cell])
+
+    def next_cell(self, cell):
+        """ The next cell on the cheapest route from `cell`, or None at a goal or dead end. """
+        d = self.direction[cell]
+        if d < 0:
+            return None
+        dr, dc = DIRECTIONS[d]
+        return cell + dr * self.grid.cols + dc
+
+    def path(self, cell):
+        """ Cell ids from `cell` to the nearest goal, or None if no goal is reachable. """
+        if not math.isfinite(self.distance[cell]):
+            return None
+        path = [cell]
+        while self.direction[cell] >= 0:
+            cell = self.next_cell(cell)
+            path.append(cell)
+        return path
+
+def flow_field_search(draw_callback, grid, start_node, end_node):
+    """ Single-query wrapper: builds a FlowField toward end_node and reads the start's path. """
+    field = FlowField(grid, [end_node.id])
+    cells = field.path(start_node.id)
+    explored = int(np.isfinite(field.distance).sum())
+    if cells is None:
+        return False, {}, explored
+    return True, [grid.node(cell) for cell in cells], explored
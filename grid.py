@@ -1,85 +1,360 @@
 import math
-import random # NEW: Import the random library for maze generation
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+# The 8 move directions, in the order of the bits of a cell's adjacency mask.
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
 
 class Node:
-    # (This class is unchanged from the previous step)
-    def __init__(self, row, col, is_obstacle=False):
+    """ Thin view of a single grid cell; all cell data lives in the Grid buffers. """
+    __slots__ = ('grid', 'id', 'row', 'col')
+
+    def __init__(self, grid, row, col):
+        self.grid = grid
+        self.id = row * grid.cols + col
         self.row = row
         self.col = col
-        self.is_obstacle = is_obstacle
-        self.terrain_cost = 1
-        self.g_cost = float('inf')
-        self.h_cost = float('inf')
-        self.f_cost = float('inf')
-        self.parent = None
     def __repr__(self):
         return f"Node({self.row}, {self.col})"
-    def __lt__(self, other):
-        return self.f_cost < other.f_cost
+    def __eq__(self, other):
+        return isinstance(other, Node) and other.id == self.id and other.grid is self.grid
+    def __hash__(self):
+        return hash(self.id)
+    @property
+    def is_obstacle(self):
+        return self.grid.obstacles[self.id] != 0
+    @property
+    def terrain_cost(self):
+        return self.grid.terrain[self.id]
     def set_obstacle(self, is_obstacle=True):
-        self.is_obstacle = is_obstacle
+        self.grid.set_obstacle(self.id, is_obstacle)
     def set_terrain(self, cost):
-        self.terrain_cost = cost
-    def reset(self):
-        self.g_cost = float('inf')
-        self.h_cost = float('inf')
-        self.f_cost = float('inf')
-        self.parent = None
+        self.grid.set_terrain(self.id, cost)
 
 class Grid:
-    def __init__(self, rows, cols):
+    """
+    Compact grid storage. Cells are addressed by an integer id (row * cols + col);
+    obstacle flags (1 byte) and terrain costs (float32) live in flat buffers.
+
+    Neighbors come from a precomputed adjacency index: one byte per cell whose bits
+    mark the walkable directions, and a per-grid table `moves` mapping each of the
+    256 masks to its (id offset, step distance) pairs. A search expands a cell with
+
+        for offset, distance in moves[adjacency[cell]]:
+            neighbor = cell + offset
+            step_cost = distance * terrain[neighbor]
+
+    which is the CSR layout with the row offsets implied by the fixed stride of 8.
+
+    Straight-line costs (line_cost / line_of_sight) are memoized in a bounded LRU
+    cache of LINE_CACHE_SIZE cell pairs, cleared on every edit. Lookups are safe
+    when several threads search the same grid.
+
+    `version` is bumped on every edit (set_obstacle, set_terrain, refresh and so
+    generate_maze), so results computed at one version can be cached against it.
+
+    Connected components of the walkable cells (8-connected, as the searches move)
+    are labelled on first use and kept up to date: opening a cell merges the labels
+    around it in O(1) through a small alias table, and blocking one only forces a
+    relabel when its walkable neighbors lose their local connection, which is the
+    only way a component can split. reachable() then rejects impossible queries
+    before a search floods the start's whole region.
+    """
+    LINE_CACHE_SIZE = 1 << 16
+    def __init__(self, rows, cols, obstacles=None, terrain=None, adjacency=None):
         self.rows = rows
         self.cols = cols
-        self.grid = self._create_grid()
+        self.size = rows * cols
+        self.obstacles = array('B', bytes(self.size)) if obstacles is None else obstacles
+        self.terrain = array('f', [1.0]) * self.size if terrain is None else terrain
+        self.adjacency = array('B', bytes(self.size)) if adjacency is None else adjacency
+        offsets = [dr * cols + dc for dr, dc in DIRECTIONS]
+        distances = [math.sqrt(dr * dr + dc * dc) for dr, dc in DIRECTIONS]
+        self.moves = [tuple((offsets[i], distances[i]) for i in range(8) if mask >> i & 1) for mask in range(256)]
+        self._listeners = []
+        self._line_cache = OrderedDict()
+        self._min_terrain = None
+        self._components = None  # flat int32 labels (0 = obstacle), None until needed
+        self._aliases = {}       # merged label -> label it was merged into
+        self._next_label = 0
+        self.version = 0
+        if adjacency is None:
+            self.rebuild_adjacency()
+
+    @classmethod
+    def from_buffers(cls, rows, cols, obstacles, terrain, adjacency=None):
+        """
+        Grid backed by existing buffers (bytes-like objects such as shared memory),
+        without copying: obstacles and adjacency hold one byte per cell, terrain one
+        float32 per cell. The adjacency index is rebuilt unless it is passed in.
+        """
+        size = rows * cols
+        obstacles = memoryview(obstacles).cast('B')[:size]
+        terrain = memoryview(terrain).cast('B')[:4 * size].cast('f')
+        if adjacency is None:
+            return cls(rows, cols, obstacles, terrain)
+        return cls(rows, cols, obstacles, terrain, memoryview(adjacency).cast('B')[:size])
 
-    def _create_grid(self):
-        # (This method is unchanged)
-        grid = []
-        for i in range(self.rows):
-            grid.append([Node(i, j) for j in range(self.cols)])
-        return grid
+    def cell_id(self, row, col):
+        return row * self.cols + col
+
+    def cell_pos(self, cell):
+        return divmod(cell, self.cols)
+
+    def node(self, cell):
+        """ Returns a Node view for a cell id. """
+        return Node(self, cell // self.cols, cell % self.cols)
 
     def get_node(self, row, col):
-        # (This method is unchanged)
         if 0 <= row < self.rows and 0 <= col < self.cols:
-            return self.grid[row][col]
+            return self.node(row * self.cols + col)
         return None
 
-    def get_neighbors(self, node):
-        # (This method is unchanged)
-        neighbors = []
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = node.row + dr, node.col + dc
-                if 0 <= r < self.rows and 0 <= c < self.cols:
-                    neighbor_node = self.grid[r][c]
-                    if not neighbor_node.is_obstacle:
-                        neighbors.append(neighbor_node)
-        return neighbors
-
-    def reset_pathfinding_data(self):
-        # (This method is unchanged)
-        for row in self.grid:
-            for node in row:
-                node.reset()
-    
-    def line_of_sight(self, node1, node2):
-        # (This method is unchanged)
-        x0, y0 = node1.col, node1.row
-        x1, y1 = node2.col, node2.row
+    def obstacle_array(self):
+        """ (rows, cols) NumPy view of the obstacle buffer (no copy). """
+        return np.frombuffer(self.obstacles, dtype=np.uint8).reshape(self.rows, self.cols)
+
+    def terrain_array(self):
+        """ (rows, cols) NumPy view of the terrain buffer (no copy). """
+        return np.frombuffer(self.terrain, dtype=np.float32).reshape(self.rows, self.cols)
+
+    def is_walkable(self, cell):
+        return not self.obstacles[cell]
+
+    def min_terrain_cost(self):
+        """ Lowest terrain cost of any walkable cell (1.0 if none); cached until the next edit. """
+        if self._min_terrain is None:
+            walkable_terrain = self.terrain_array()[self.obstacle_array() == 0]
+            self._min_terrain = float(walkable_terrain.min()) if walkable_terrain.size else 1.0
+        return self._min_terrain
+
+    def add_listener(self, callback):
+        """
+        Registers callback(cells) to run after every edit. `cells` lists the changed
+        cell ids, or is None when the whole grid changed (see refresh()).
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, cells):
+        self.version += 1
+        self._line_cache.clear()
+        self._min_terrain = None
+        for callback in self._listeners:
+            callback(cells)
+
+    def refresh(self):
+        """ Call after bulk writes to the obstacle/terrain buffers. """
+        self.rebuild_adjacency()
+        self._components = None
+        self._notify(None)
+
+    def set_obstacle(self, cell, is_obstacle=True):
+        value = 1 if is_obstacle else 0
+        if self.obstacles[cell] == value:
+            return
+        self.obstacles[cell] = value
+        # Only the 8 cells around this one can move to it, so only their masks change.
+        row, col = divmod(cell, self.cols)
+        for i, (dr, dc) in enumerate(DIRECTIONS):
+            r, c = row - dr, col - dc
+            if 0 <= r < self.rows and 0 <= c < self.cols:
+                if is_obstacle:
+                    self.adjacency[r * self.cols + c] &= ~(1 << i) & 0xFF
+                else:
+                    self.adjacency[r * self.cols + c] |= 1 << i
+        if self._components is not None:
+            self._update_components(cell, is_obstacle)
+        self._notify((cell,))
+
+    def set_terrain(self, cell, cost):
+        # Step costs read terrain at expansion time, so the adjacency index is unaffected.
+        if self.terrain[cell] == cost:
+            return
+        self.terrain[cell] = cost
+        self._notify((cell,))
+
+    def rebuild_adjacency(self):
+        """ Recomputes every adjacency mask from the obstacle buffer. """
+        walkable = self.obstacle_array() == 0
+        mask = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        for i, (dr, dc) in enumerate(DIRECTIONS):
+            # Bit i of a cell is set when the cell at (row + dr, col + dc) exists and is walkable.
+            dst = mask[max(0, -dr):self.rows - max(0, dr), max(0, -dc):self.cols - max(0, dc)]
+            src = walkable[max(0, dr):self.rows + min(0, dr), max(0, dc):self.cols + min(0, dc)]
+            dst |= src.astype(np.uint8) << i
+        np.frombuffer(self.adjacency, dtype=np.uint8)[:] = mask.ravel()
+
+    # --- Connected components ---
+    def _label_components(self):
+        # Vectorized union-find over horizontal runs of walkable cells: each run is a
+        # node, and every vertical or diagonal step between rows joins two runs. Each
+        # round hooks the larger of two roots joined by an edge under the smaller one
+        # and flattens the trees by pointer jumping. A root survives a round only if
+        # no neighboring root is smaller, so the number of roots at least halves.
+        cols, size = self.cols, self.size
+        walkable = self.obstacle_array() == 0
+        run_start = walkable.copy()
+        run_start[:, 1:] &= ~walkable[:, :-1]
+        run_of = np.cumsum(run_start.ravel(), dtype=np.int32) - 1
+        parent = np.arange(int(run_of[-1]) + 1 if size else 0, dtype=np.int32)
+        flat = walkable.ravel()
+        # Straight down from cell i to i + cols. Consecutive steps along a row mostly
+        # join the same two runs, so repeats are dropped up front.
+        cells = np.flatnonzero(flat[:size - cols] & flat[cols:])
+        run_u, run_v = run_of[cells], run_of[cells + cols]
+        keep = np.ones(cells.size, dtype=bool)
+        keep[1:] = (run_u[1:] != run_u[:-1]) | (run_v[1:] != run_v[:-1])
+        u, v = [run_u[keep]], [run_v[keep]]
+        # A diagonal step only joins new runs when it cuts a corner between two
+        # obstacles; otherwise one of the straight steps beside it links the same runs.
+        if size > cols + 1:
+            not_last_col = np.ones(size - cols - 1, dtype=bool)
+            not_last_col[cols - 1::cols] = False
+            # Down-right from i to i + cols + 1, past the blocked i + 1 and i + cols.
+            cells = np.flatnonzero(flat[:size - cols - 1] & flat[cols + 1:] & ~flat[1:size - cols] & ~flat[cols:size - 1] & not_last_col)
+            u.append(run_of[cells])
+            v.append(run_of[cells + cols + 1])
+            # Down-left from i + 1 to i + cols, past the blocked i and i + cols + 1.
+            cells = np.flatnonzero(flat[1:size - cols] & flat[cols:size - 1] & ~flat[:size - cols - 1] & ~flat[cols + 1:] & not_last_col) + 1
+            u.append(run_of[cells])
+            v.append(run_of[cells + cols - 1])
+        u, v = np.concatenate(u), np.concatenate(v)
+        while u.size:
+            root_u, root_v = parent[u], parent[v]
+            split = root_u != root_v
+            u, v, root_u, root_v = u[split], v[split], root_u[split], root_v[split]
+            if not u.size:
+                break
+            np.minimum.at(parent, np.maximum(root_u, root_v), np.minimum(root_u, root_v))
+            while True:
+                jumped = parent[parent]
+                if np.array_equal(jumped, parent):
+                    break
+                parent = jumped
+        is_root = parent == np.arange(parent.size, dtype=np.int32)
+        label_of_run = np.cumsum(is_root, dtype=np.int32)[parent]
+        self._components = np.where(flat, label_of_run[run_of] if parent.size else 0, 0).astype(np.int32)
+        self._aliases = {}
+        self._next_label = int(is_root.sum()) + 1
+
+    def _find_label(self, label):
+        aliases = self._aliases
+        root = label
+        while root in aliases:
+            root = aliases[root]
+        while label != root:
+            aliases[label], label = root, aliases[label]
+        return root
+
+    def _update_components(self, cell, is_obstacle):
+        components = self._components
+        neighbors = self.get_neighbors(cell)
+        if not is_obstacle:
+            labels = {self._find_label(int(components[n])) for n in neighbors}
+            if labels:
+                keep = min(labels)
+                for label in labels:
+                    if label != keep:
+                        self._aliases[label] = keep
+            else:
+                keep = self._next_label
+                self._next_label += 1
+            components[cell] = keep
+            return
+        components[cell] = 0
+        # Paths through the cell can be rerouted around it if its walkable neighbors
+        # are still connected to each other; otherwise the component may have split.
+        if len(neighbors) > 1:
+            cols = self.cols
+            positions = [divmod(n, cols) for n in neighbors]
+            seen, stack = {0}, [0]
+            while stack:
+                r, c = positions[stack.pop()]
+                for j, (r2, c2) in enumerate(positions):
+                    if j not in seen and abs(r - r2) <= 1 and abs(c - c2) <= 1:
+                        seen.add(j)
+                        stack.append(j)
+            if len(seen) < len(neighbors):
+                self._components = None
+
+    def component(self, cell):
+        """ Connected-component label of a cell (0 for obstacles); labels are only meaningful until the next edit. """
+        if self._components is None:
+            self._label_components()
+        label = int(self._components[cell])
+        return self._find_label(label) if label else 0
+
+    def component_array(self):
+        """ (rows, cols) array of component labels, 0 for obstacles. """
+        if self._components is None:
+            self._label_components()
+        components = self._components
+        if self._aliases:
+            lookup = np.arange(self._next_label, dtype=np.int32)
+            for label in list(self._aliases):
+                lookup[label] = self._find_label(label)
+            components = lookup[components]
+        return components.reshape(self.rows, self.cols)
+
+    def reachable(self, start, goal):
+        """
+        True if a search from `start` can reach `goal`. A blocked goal is never
+        entered, while a blocked start can still step onto its walkable neighbors.
+        """
+        if start == goal:
+            return True
+        goal_label = self.component(goal)
+        if not goal_label:
+            return False
+        start_label = self.component(start)
+        if start_label:
+            return start_label == goal_label
+        return any(self.component(n) == goal_label for n in self.get_neighbors(start))
+
+    def get_neighbors(self, cell):
+        """ Returns the ids of the walkable 8-connected neighbors of a cell. """
+        return [cell + offset for offset, _ in self.moves[self.adjacency[cell]]]
+
+    def line_cost(self, cell1, cell2):
+        """
+        Cost of moving in a straight line from cell1 to cell2, or None if a cell on
+        the Bresenham line is blocked. The line length is split evenly over the k
+        cells entered after cell1, each step paying that cell's terrain, so a
+        straight or 45-degree line costs exactly the same as the equivalent grid moves.
+        """
+        key = (cell1, cell2)
+        cache = self._line_cache
+        # Concurrent searches share the cache, so every step is a single dict call
+        # that stays safe when another thread evicts the same key in between.
+        cost = cache.pop(key, cache)
+        if cost is cache:
+            cost = self._walk_line(cell1, cell2)
+        cache[key] = cost
+        if len(cache) > self.LINE_CACHE_SIZE:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                pass  # another thread emptied it first
+        return cost
+
+    def _walk_line(self, cell1, cell2):
+        obstacles, terrain, cols = self.obstacles, self.terrain, self.cols
+        y0, x0 = divmod(cell1, cols)
+        y1, x1 = divmod(cell2, cols)
+        if obstacles[cell1]:
+            return None
         dx, dy = abs(x1 - x0), abs(y1 - y0)
         x, y = x0, y0
         sx = 1 if x0 < x1 else -1
         sy = 1 if y0 < y1 else -1
         err = dx - dy
-        while True:
-            node = self.get_node(y, x)
-            if node is None or node.is_obstacle:
-                return False
-            if x == x1 and y == y1:
-                break
+        total_terrain = 0.0
+        while x != x1 or y != y1:
             e2 = 2 * err
             if e2 > -dy:
                 err -= dy
@@ -87,46 +362,23 @@ class Grid:
             if e2 < dx:
                 err += dx
                 y += sy
-        return True
-
-    # NEW: Maze generation using recursive backtracking
-    def generate_maze(self, start_row=0, start_col=0):
-        """ Generates a perfect maze on the grid. """
-        # 1. Start with a grid full of walls.
-        for row in self.grid:
-            for node in row:
-                node.set_obstacle(True)
-                node.set_terrain(1) # Reset terrain
-
-        stack = []
-        start_node = self.get_node(start_row, start_col)
-        start_node.set_obstacle(False)
-        stack.append(start_node)
-
-        while stack:
-            current_node = stack[-1]
-            r, c = current_node.row, current_node.col
-            
-            neighbors = []
-            # Check neighbors 2 cells away
-            for dr, dc in [(0, 2), (0, -2), (2, 0), (-2, 0)]:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                    neighbor = self.get_node(nr, nc)
-                    if neighbor.is_obstacle:
-                        neighbors.append(neighbor)
-            
-            if neighbors:
-                next_node = random.choice(neighbors)
-                
-                # Carve the path between current and next node
-                wall_r = (r + next_node.row) // 2
-                wall_c = (c + next_node.col) // 2
-                wall_between = self.get_node(wall_r, wall_c)
-                
-                wall_between.set_obstacle(False)
-                next_node.set_obstacle(False)
-                
-                stack.append(next_node)
-            else:
-                stack.pop()
\ No newline at end of file
+            cell = y * cols + x
+            if obstacles[cell]:
+                return None
+            total_terrain += terrain[cell]
+        steps = max(dx, dy)
+        return math.sqrt(dx * dx + dy * dy) * total_terrain / steps if steps else 0.0
+
+    def line_of_sight(self, cell1, cell2):
+        """ True if no cell on the Bresenham line between two cell ids is blocked. """
+        return self.line_cost(cell1, cell2) is not None
+
+    def generate_maze(self, start_row=0, start_col=0, seed=None, algorithm='backtracker'):
+        """
+        Generates a perfect maze on the grid (and resets terrain), reproducible from
+        `seed`; see map_generators.carve_maze for the algorithms.
+        """
+        from map_generators import carve_maze
+        self.terrain[:] = array('f', [1.0]) * self.size
+        carve_maze(self.obstacle_array(), seed, algorithm, start_row, start_col)
+        self.refresh()
@@ -0,0 +1,284 @@
+import math
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from open_list import OpenList
+
+# A heuristic is bound to a grid and a goal once per query; bind() returns a plain
+# h(cell) closure so the search loops pay one call per generated neighbor.
+#
+# bind(grid, goal) estimates the cost from a cell to `goal`. bind(grid, source,
+# reverse=True) estimates the cost from `source` to a cell, which is what a backward
+# search needs; the two only differ for asymmetric heuristics such as landmarks.
+
+class Heuristic:
+    """ Base class for pluggable heuristics. """
+    name = 'heuristic'
+
+    def bind(self, grid, goal, reverse=False):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+class DistanceHeuristic(Heuristic):
+    """
+    Geometric distance to the goal, multiplied by the cheapest walkable terrain cost
+    so that it stays a lower bound on weighted grids. Octile is the exact cost of an
+    8-connected move sequence on uniform terrain and the default for the searches;
+    Euclidean suits any-angle paths; Manhattan overestimates diagonal moves and is
+    only kept for comparison; zero turns A* into Dijkstra.
+    """
+    METRICS = ('octile', 'euclidean', 'manhattan', 'zero')
+
+    def __init__(self, metric, scale_by_terrain=True):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {self.METRICS}")
+        self.name = metric
+        self.scale_by_terrain = scale_by_terrain
+
+    def bind(self, grid, goal, reverse=False, terrain_scale=None):
+        """ `terrain_scale` replaces the grid's current cheapest terrain cost, e.g. to keep an older, smaller one. """
+        cols = grid.cols
+        goal_row, goal_col = divmod(goal, cols)
+        if not self.scale_by_terrain:
+            scale = 1.0
+        else:
+            scale = grid.min_terrain_cost() if terrain_scale is None else terrain_scale
+        if self.name == 'octile':
+            diagonal = (math.sqrt(2) - 2) * scale
+            def h(cell):
+                dr, dc = abs(cell // cols - goal_row), abs(cell % cols - goal_col)
+                return (dr + dc) * scale + diagonal * (dr if dr < dc else dc)
+        elif self.name == 'euclidean':
+            def h(cell):
+                return math.hypot(cell // cols - goal_row, cell % cols - goal_col) * scale
+        elif self.name == 'manhattan':
+            def h(cell):
+                return (abs(cell // cols - goal_row) + abs(cell % cols - goal_col)) * scale
+        else:
+            def h(cell):
+                return 0.0
+        return h
+
+HEURISTICS = {metric: DistanceHeuristic(metric) for metric in DistanceHeuristic.METRICS}
+
+def resolve_heuristic(heuristic):
+    """ Accepts a Heuristic instance or the name of one of HEURISTICS. """
+    if isinstance(heuristic, Heuristic):
+        return heuristic
+    try:
+        return HEURISTICS[heuristic]
+    except KeyError:
+        raise ValueError(f"Unknown heuristic {heuristic!r}; expected a Heuristic or one of {sorted(HEURISTICS)}") from None
+
+class NearestGoalIndex:
+    """
+    Octile distance from a cell to the nearest of a set of goals, scaled by the
+    cheapest walkable terrain like DistanceHeuristic, for searches with several
+    goals. The minimum of consistent heuristics is consistent, so A* with this
+    estimate reaches the goals in order of their true cost.
+
+    Goals are bucketed into square tiles of `tile` cells (by default sized for
+    about one goal per tile). A lookup scans rings of tiles outward from the cell's
+    own tile and stops once every cell of the next ring is farther away than the
+    best goal so far, so it touches a handful of goals instead of all of them.
+    Estimates are memoized per cell; discard() removes a reached goal and clears
+    them, since every estimate can only grow.
+    """
+    def __init__(self, grid, goals, tile=None):
+        self.cols = grid.cols
+        self.scale = grid.min_terrain_cost()
+        goals = set(goals)
+        self.tile = tile or max(4, math.isqrt(grid.size // max(1, len(goals))))
+        self.max_ring = max(grid.rows, grid.cols) // self.tile + 1
+        self.tiles = {}
+        for goal in goals:
+            row, col = divmod(goal, self.cols)
+            self.tiles.setdefault((row // self.tile, col // self.tile), []).append((row, col))
+        self._count = len(goals)
+        self._cache = {}
+
+    def __len__(self):
+        return self._count
+
+    def discard(self, goal):
+        row, col = divmod(goal, self.cols)
+        key = (row // self.tile, col // self.tile)
+        members = self.tiles.get(key)
+        if members and (row, col) in members:
+            members.remove((row, col))
+            if not members:
+                del self.tiles[key]
+            self._count -= 1
+            self._cache.clear()
+
+    def __call__(self, cell):
+        h = self._cache.get(cell)
+        if h is not None:
+            return h
+        row, col = divmod(cell, self.cols)
+        tile, tiles = self.tile, self.tiles
+        tile_row, tile_col = row // tile, col // tile
+        diagonal = math.sqrt(2) - 2
+        best = math.inf
+        for ring in range(self.max_ring + 1):
+            # Cells of a tile `ring` tiles away are at least (ring - 1) * tile + 1
+            # rows or columns away, and octile distance is never below that.
+            if ring and (ring - 1) * tile + 1 >= best:
+                break
+            for dr in range(-ring, ring + 1):
+                # Whole top and bottom rows of the ring; only its two ends in between.
+                step = 1 if dr in (-ring, ring) else 2 * ring or 1
+                for dc in range(-ring, ring + 1, step):
+                    for goal_row, goal_col in tiles.get((tile_row + dr, tile_col + dc), ()):
+                        dy, dx = abs(goal_row - row), abs(goal_col - col)
+                        distance = dy + dx + diagonal * (dy if dy < dx else dx)
+                        if distance < best:
+                            best = distance
+        h = self._cache[cell] = best * self.scale
+        return h
+
+def distance_table(grid, source, reverse=False):
+    """
+    Cheapest cost from `source` to every cell (or from every cell to `source` with
+    reverse=True) as a flat array('f'); unreachable cells hold infinity.
+    """
+    terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+    dist = array('f', [math.inf]) * grid.size
+    if grid.obstacles[source]:
+        return dist
+    g_cost = {source: 0.0}
+    open_list = OpenList()
+    open_list.push(source, 0.0)
+    while open_list:
+        current = open_list.pop()
+        current_g = g_cost[current]
+        dist[current] = current_g
+        leave_cost = terrain[current]
+        for offset, distance in moves[adjacency[current]]:
+            neighbor = current + offset
+            g = current_g + distance * (leave_cost if reverse else terrain[neighbor])
+            if g < g_cost.get(neighbor, math.inf):
+                g_cost[neighbor] = g
+                open_list.push(neighbor, g)
+    return dist
+
+class LandmarkHeuristic(Heuristic):
+    """
+    ALT heuristic: exact costs from and to a few landmark cells, combined through
+    the triangle inequality. For a landmark L,
+
+        d(x, goal) >= d(L, goal) - d(L, x)    and    d(x, goal) >= d(x, L) - d(goal, L)
+
+    and the largest bound over all landmarks (and the octile bound) is used. On mazes
+    and maps with long detours this is far tighter than any geometric estimate.
+
+    Landmarks are picked farthest-first, so they end up on the periphery of the map.
+    Each one costs two full Dijkstra sweeps, stored as float32 arrays. The tables
+    follow the grid through a listener: any edit marks them stale and they are
+    rebuilt on the next bind(). Bound goals are cached (GOAL_CACHE_SIZE entries) with
+    the landmark distances of the goal already looked up.
+    """
+    name = 'landmarks'
+    GOAL_CACHE_SIZE = 64
+
+    def __init__(self, grid, num_landmarks=8, landmarks=None):
+        self.grid = grid
+        self.num_landmarks = num_landmarks if landmarks is None else len(landmarks)
+        self._fixed_landmarks = list(landmarks) if landmarks is not None else None
+        self.landmarks = []
+        self.dist_from = []
+        self.dist_to = []
+        self._slack = 0.0
+        self._stale = True
+        self._bound = OrderedDict()
+        grid.add_listener(self._on_grid_changed)
+
+    def close(self):
+        """ Stops tracking grid edits. """
+        self.grid.remove_listener(self._on_grid_changed)
+
+    def _on_grid_changed(self, cells):
+        self._stale = True
+        self._bound.clear()
+
+    def rebuild(self):
+        """ Selects the landmarks (unless fixed) and recomputes their distance tables. """
+        grid = self.grid
+        self.landmarks, self.dist_from, self.dist_to = [], [], []
+        walkable = np.flatnonzero(grid.obstacle_array().ravel() == 0)
+        if walkable.size:
+            if self._fixed_landmarks is not None:
+                for landmark in self._fixed_landmarks:
+                    self._add_landmark(landmark)
+            else:
+                # Farthest-first: seed from an arbitrary cell, then repeatedly take the
+                # cell farthest from every landmark chosen so far.
+                nearest = np.frombuffer(distance_table(grid, int(walkable[0])), dtype=np.float32).copy()
+                while len(self.landmarks) < min(self.num_landmarks, walkable.size):
+                    candidates = np.where(np.isfinite(nearest), nearest, -1.0)
+                    candidates[self.landmarks] = -1.0
+                    landmark = int(np.argmax(candidates))
+                    if candidates[landmark] < 0:
+                        break
+                    self._add_landmark(landmark)
+                    np.minimum(nearest, np.frombuffer(self.dist_from[-1], dtype=np.float32), out=nearest)
+        # float32 rounding can push a difference of two table entries slightly above
+        # the true cost; subtracting this keeps the bounds admissible.
+        largest = 0.0
+        for table in self.dist_from + self.dist_to:
+            values = np.frombuffer(table, dtype=np.float32)
+            finite = values[np.isfinite(values)]
+            if finite.size:
+                largest = max(largest, float(finite.max()))
+        self._slack = largest * 2.0 ** -22
+        self._bound.clear()
+        self._stale = False
+
+    def _add_landmark(self, landmark):
+        self.landmarks.append(landmark)
+        self.dist_from.append(distance_table(self.grid, landmark))
+        self.dist_to.append(distance_table(self.grid, landmark, reverse=True))
+
+    def bind(self, grid, goal, reverse=False):
+        if grid is not self.grid:
+            raise ValueError("LandmarkHeuristic is bound to a different grid")
+        if self._stale:
+            self.rebuild()
+        key = (goal, reverse)
+        h = self._bound.get(key)
+        if h is not None:
+            self._bound.move_to_end(key)
+            return h
+        # Each term is (table_a, value_a, table_b, value_b) with the bound
+        # max(value_a - table_a[x], table_b[x] - value_b).
+        if reverse:
+            # Lower bounds on d(goal, x): d(L, x) - d(L, goal) and d(goal, L) - d(x, L).
+            terms = [(dist_to, dist_to[goal], dist_from, dist_from[goal])
+                     for dist_from, dist_to in zip(self.dist_from, self.dist_to)]
+        else:
+            # Lower bounds on d(x, goal): d(L, goal) - d(L, x) and d(x, L) - d(goal, L).
+            terms = [(dist_from, dist_from[goal], dist_to, dist_to[goal])
+                     for dist_from, dist_to in zip(self.dist_from, self.dist_to)]
+        octile = HEURISTICS['octile'].bind(grid, goal, reverse)
+        slack = self._slack
+        def h(cell):
+            best = -math.inf
+            for table_a, value_a, table_b, value_b in terms:
+                # inf - inf is NaN and fails both comparisons, so such terms drop out.
+                bound = value_a - table_a[cell]
+                if bound > best:
+                    best = bound
+                bound = table_b[cell] - value_b
+                if bound > best:
+                    best = bound
+            best -= slack
+            geometric = octile(cell)
+            return best if best > geometric else geometric
+        self._bound[key] = h
+        if len(self._bound) > self.GOAL_CACHE_SIZE:
+            self._bound.popitem(last=False)
+        return h
@@ -0,0 +1,423 @@
+import math
+
+import numpy as np
+
+from grid import DIRECTIONS
+from open_list import OpenList
+from heuristics import HEURISTICS
+from search_trace import EXPAND, PUSH
+
+# Entrances longer than this get a transition at each end instead of one in the middle.
+LONG_ENTRANCE = 6
+
+class HierarchicalGrid:
+    """
+    HPA* abstraction over a Grid.
+
+    The grid is cut into square clusters. Where two neighboring clusters touch,
+    each run of walkable cell pairs across the border becomes an entrance with one
+    or two transitions; diagonal-only crossings and cluster corners get their own
+    transitions, so the abstract graph keeps every connection the grid has. The
+    transition cells are the abstract nodes. Inter-cluster edges are the single
+    steps across the border; intra-cluster edges hold the terrain-aware cost of the
+    cheapest path between two abstract nodes that stays inside their cluster.
+
+    Edits reported by the grid mark their clusters dirty; the affected borders and
+    intra-cluster edges are rebuilt lazily before the next query.
+    """
+    def __init__(self, grid, cluster_size=16):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.cluster_rows = -(-grid.rows // cluster_size)
+        self.cluster_cols = -(-grid.cols // cluster_size)
+        self._borders = {}   # border key -> [(cell_a, cell_b), ...]
+        self._intra = {}     # cluster -> {node: {node: cost}}
+        self._inter = {}     # node -> [node across a border, ...]
+        self._dirty = {(cr, cc) for cr in range(self.cluster_rows) for cc in range(self.cluster_cols)}
+        grid.add_listener(self._on_grid_changed)
+
+    def close(self):
+        """ Stops tracking grid edits. """
+        self.grid.remove_listener(self._on_grid_changed)
+
+    def cluster_of(self, cell):
+        row, col = divmod(cell, self.grid.cols)
+        return row // self.cluster_size, col // self.cluster_size
+
+    def _bounds(self, cluster):
+        cr, cc = cluster
+        size = self.cluster_size
+        return cr * size, min((cr + 1) * size, self.grid.rows), cc * size, min((cc + 1) * size, self.grid.cols)
+
+    def _neighbor_clusters(self, cluster):
+        cr, cc = cluster
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                if 0 <= cr + dr < self.cluster_rows and 0 <= cc + dc < self.cluster_cols:
+                    yield cr + dr, cc + dc
+
+    def _on_grid_changed(self, cells):
+        if cells is None:
+            self._dirty = {(cr, cc) for cr in range(self.cluster_rows) for cc in range(self.cluster_cols)}
+            return
+        for cell in cells:
+            self._dirty.add(self.cluster_of(cell))
+
+    # --- Building ---
+    def _border_keys(self, cluster):
+        """ Keys of every border the cluster takes part in; each key names its upper-left cluster. """
+        cr, cc = cluster
+        keys = []
+        for kind, dr, dc in (('h', 0, 1), ('v', 1, 0), ('d', 1, 1), ('a', 1, -1)):
+            for r, c in ((cr, cc), (cr - dr, cc - dc)):
+                if 0 <= r < self.cluster_rows and 0 <= c < self.cluster_cols and \
+                   0 <= r + dr < self.cluster_rows and 0 <= c + dc < self.cluster_cols:
+                    keys.append((kind, r, c))
+        return keys
+
+    def _build_border(self, key):
+        obstacles, cols = self.grid.obstacles, self.grid.cols
+        kind, cr, cc = key
+        r0, r1, c0, c1 = self._bounds((cr, cc))
+        if kind == 'd':
+            a, b = (r1 - 1) * cols + c1 - 1, r1 * cols + c1
+            return [(a, b)] if not obstacles[a] and not obstacles[b] else []
+        if kind == 'a':
+            a, b = (r1 - 1) * cols + c0, r1 * cols + c0 - 1
+            return [(a, b)] if not obstacles[a] and not obstacles[b] else []
+        if kind == 'h':
+            # Cells of the last column of this cluster against the first column of the next.
+            side_a = [r * cols + c1 - 1 for r in range(r0, r1)]
+        else:
+            side_a = [(r1 - 1) * cols + c for c in range(c0, c1)]
+        step = 1 if kind == 'h' else cols
+        side_b = [cell + step for cell in side_a]
+        open_pair = [not obstacles[a] and not obstacles[b] for a, b in zip(side_a, side_b)]
+        transitions = []
+        i, length = 0, len(side_a)
+        while i < length:
+            if not open_pair[i]:
+                i += 1
+                continue
+            j = i
+            while j + 1 < length and open_pair[j + 1]:
+                j += 1
+            if j - i + 1 >= LONG_ENTRANCE:
+                transitions += [(side_a[i], side_b[i]), (side_a[j], side_b[j])]
+            else:
+                middle = (i + j) // 2
+                transitions.append((side_a[middle], side_b[middle]))
+            i = j + 1
+        # Diagonal steps across the border that no straight pair next to them covers.
+        for i in range(length - 1):
+            if open_pair[i] or open_pair[i + 1]:
+                continue
+            for a, b in ((side_a[i], side_b[i + 1]), (side_a[i + 1], side_b[i])):
+                if not obstacles[a] and not obstacles[b]:
+                    transitions.append((a, b))
+        return transitions
+
+    def _cluster_nodes(self, cluster):
+        nodes = set()
+        for key in self._border_keys(cluster):
+            for a, b in self._borders[key]:
+                for cell in (a, b):
+                    if self.cluster_of(cell) == cluster:
+                        nodes.add(cell)
+        return nodes
+
+    def _ensure_built(self):
+        if not self._dirty:
+            return
+        touched = set()
+        for cluster in self._dirty:
+            for key in self._border_keys(cluster):
+                self._borders[key] = self._build_border(key)
+            touched.update(self._neighbor_clusters(cluster))
+        for cluster in touched:
+            self._intra[cluster] = self._intra_costs(cluster, sorted(self._cluster_nodes(cluster)))
+        self._inter = {}
+        for transitions in self._borders.values():
+            for a, b in transitions:
+                self._inter.setdefault(a, []).append(b)
+                self._inter.setdefault(b, []).append(a)
+        self._dirty.clear()
+
+    def _intra_costs(self, cluster, nodes):
+        """
+        Cheapest in-cluster cost between every pair of abstract nodes, from one
+        vectorized relaxation over a (nodes, height, width) cost array: every sweep
+        relaxes all 8 move directions for all sources at once, until nothing improves.
+        """
+        if not nodes:
+            return {}
+        grid = self.grid
+        r0, r1, c0, c1 = self._bounds(cluster)
+        height, width = r1 - r0, c1 - c0
+        walkable = grid.obstacle_array()[r0:r1, c0:c1] == 0
+        terrain = grid.terrain_array()[r0:r1, c0:c1].astype(np.float64)
+        dist = np.full((len(nodes), height, width), np.inf)
+        positions = [((node // grid.cols) - r0, (node % grid.cols) - c0) for node in nodes]
+        for i, (row, col) in enumerate(positions):
+            dist[i, row, col] = 0.0
+        steps = []
+        for dr, dc in DIRECTIONS:
+            # Moving from source slice `src` onto target slice `dst` pays distance * terrain of the target.
+            src = (slice(max(0, -dr), height - max(0, dr)), slice(max(0, -dc), width - max(0, dc)))
+            dst = (slice(max(0, dr), height + min(0, dr)), slice(max(0, dc), width + min(0, dc)))
+            cost = np.where(walkable[dst], math.sqrt(dr * dr + dc * dc) * terrain[dst], np.inf)
+            steps.append((src, dst, cost))
+        changed = True
+        while changed:
+            changed = False
+            for src, dst, cost in steps:
+                target = dist[(slice(None),) + dst]
+                candidate = dist[(slice(None),) + src] + cost
+                improved = candidate < target
+                if improved.any():
+                    np.minimum(target, candidate, out=target)
+                    changed = True
+        intra = {}
+        for i, node in enumerate(nodes):
+            row_costs = {}
+            for j, other in enumerate(nodes):
+                cost = dist[i, positions[j][0], positions[j][1]]
+                if i != j and cost < math.inf:
+                    row_costs[other] = float(cost)
+            intra[node] = row_costs
+        return intra
+
+    def _cluster_edges(self, cluster, reverse=False):
+        """
+        Edge lists of one cluster, {cell: [(neighbor, cost), ...]}, keeping only moves
+        that stay inside it. With reverse=True every edge points the other way (a step
+        pays the terrain of the cell it leaves), for searches measured towards a target.
+        """
+        grid = self.grid
+        terrain, moves, adjacency, cols = grid.terrain, grid.moves, grid.adjacency, grid.cols
+        r0, r1, c0, c1 = self._bounds(cluster)
+        edges = {}
+        for row in range(r0, r1):
+            for col in range(c0, c1):
+                cell = row * cols + col
+                if grid.obstacles[cell]:
+                    continue
+                out = []
+                for offset, distance in moves[adjacency[cell]]:
+                    neighbor = cell + offset
+                    if r0 <= neighbor // cols < r1 and c0 <= neighbor % cols < c1:
+                        out.append((neighbor, distance * (terrain[cell] if reverse else terrain[neighbor])))
+                edges[cell] = out
+        return edges
+
+    @staticmethod
+    def _cluster_search(edges, source, targets=(), stop_at=None):
+        """
+        Dijkstra from source over one cluster's edge lists. Stops once every target
+        is settled, or once stop_at is. Returns (dist, parent, expanded).
+        """
+        dist, parent = {source: 0.0}, {source: None}
+        remaining = set(targets)
+        remaining.discard(source)
+        open_list = OpenList()
+        open_list.push(source, 0.0)
+        closed = set()
+        while open_list:
+            current = open_list.pop()
+            closed.add(current)
+            if current == stop_at:
+                break
+            remaining.discard(current)
+            if targets and not remaining:
+                break
+            current_g = dist[current]
+            for neighbor, cost in edges[current]:
+                if neighbor in closed:
+                    continue
+                g = current_g + cost
+                if g < dist.get(neighbor, math.inf):
+                    dist[neighbor] = g
+                    parent[neighbor] = current
+                    open_list.push(neighbor, g)
+        return dist, parent, len(closed)
+
+    def _local_search(self, start, end):
+        """
+        A* from start to end that stays inside the clusters around both cells
+        (their bounding box grown by one cluster). Returns (cost, path, expanded);
+        cost is inf and path None when no path stays inside.
+        """
+        grid = self.grid
+        terrain, moves, adjacency, cols = grid.terrain, grid.moves, grid.adjacency, grid.cols
+        (sr, sc), (er, ec) = self.cluster_of(start), self.cluster_of(end)
+        size = self.cluster_size
+        r0, r1 = max(0, (min(sr, er) - 1) * size), min(grid.rows, (max(sr, er) + 2) * size)
+        c0, c1 = max(0, (min(sc, ec) - 1) * size), min(grid.cols, (max(sc, ec) + 2) * size)
+        h = HEURISTICS['octile'].bind(grid, end)
+        g_cost, parent = {start: 0.0}, {start: None}
+        open_list = OpenList()
+        open_list.push(start, h(start))
+        closed = set()
+        while open_list:
+            current = open_list.pop()
+            if current == end:
+                return g_cost[end], self._cells_from(parent, end)[::-1], len(closed)
+            closed.add(current)
+            current_g = g_cost[current]
+            for offset, distance in moves[adjacency[current]]:
+                neighbor = current + offset
+                if neighbor in closed:
+                    continue
+                row, col = divmod(neighbor, cols)
+                if not (r0 <= row < r1 and c0 <= col < c1):
+                    continue
+                g = current_g + distance * terrain[neighbor]
+                if g < g_cost.get(neighbor, math.inf):
+                    g_cost[neighbor] = g
+                    parent[neighbor] = current
+                    open_list.push(neighbor, g + h(neighbor))
+        return math.inf, None, len(closed)
+
+    # --- Queries ---
+    def _abstract_edges(self, cell):
+        """ Yields (neighbor, cost, kind) for an abstract node; kind is 'intra' or 'inter'. """
+        grid = self.grid
+        cluster = self.cluster_of(cell)
+        for other, cost in self._intra[cluster].get(cell, {}).items():
+            yield other, cost, 'intra'
+        row, col = divmod(cell, grid.cols)
+        for other in self._inter.get(cell, ()):
+            other_row, other_col = divmod(other, grid.cols)
+            distance = math.sqrt((row - other_row) ** 2 + (col - other_col) ** 2)
+            yield other, distance * grid.terrain[other], 'inter'
+
+    def find_path(self, start, end, draw_callback=None, trace=None, stats=None):
+        """
+        Returns (path as cell ids or None, expanded count) for a start/end cell pair.
+        A trace records the search over the abstract graph only; stats count the
+        expansions of every phase but the open-list operations of that search only.
+
+        Routes through the abstract graph pass the entrance transitions, which can
+        be a long detour for short trips. When start and end are in the same or
+        adjacent clusters, a direct A* bounded to the clusters around them runs
+        first, and the abstract search only replaces its path with a cheaper one.
+        """
+        record = trace.events.append if trace is not None else None
+        if stats is not None: stats.begin('build')
+        if not self.grid.reachable(start, end):
+            if stats is not None: stats.end()
+            return None, 0
+        self._ensure_built()
+        if stats is not None: stats.phase('insert')
+        start_cluster, end_cluster = self.cluster_of(start), self.cluster_of(end)
+        start_nodes = self._cluster_nodes(start_cluster)
+        # Link start and end into the abstract graph through their own clusters.
+        start_dist, start_parent, expanded = self._cluster_search(self._cluster_edges(start_cluster), start)
+        end_dist, end_parent, end_expanded = self._cluster_search(self._cluster_edges(end_cluster, reverse=True), end)
+        expanded += end_expanded
+
+        best_cost, best_route, local_path = math.inf, None, None
+        if max(abs(start_cluster[0] - end_cluster[0]), abs(start_cluster[1] - end_cluster[1])) <= 1:
+            best_cost, local_path, local_expanded = self._local_search(start, end)
+            expanded += local_expanded
+
+        g_cost = {start: 0.0}
+        parent = {start: (None, None)}
+        open_list = OpenList()
+        closed = set()
+        h = HEURISTICS['octile'].bind(self.grid, end)
+        open_list.push(start, h(start))
+        if record: record(start << 2 | PUSH)
+        if stats is not None:
+            stats.expansions += expanded
+            stats.phase('abstract')
+        try:
+            while open_list and open_list.min_f() < best_cost:
+                current = open_list.pop()
+                if record: record(current << 2 | EXPAND)
+                closed.add(current)
+                expanded += 1
+                current_g = g_cost[current]
+                if current != start and current in end_dist and current_g + end_dist[current] < best_cost:
+                    best_cost, best_route = current_g + end_dist[current], self._route(parent, current)
+                if current == start:
+                    edges = [(node, start_dist[node], 'start') for node in start_nodes if node in start_dist and node != start]
+                    if start in start_nodes:
+                        edges += self._abstract_edges(start)
+                else:
+                    edges = self._abstract_edges(current)
+                if stats is not None: edges = list(edges)
+                for neighbor, cost, kind in edges:
+                    if neighbor in closed:
+                        continue
+                    g = current_g + cost
+                    if g < g_cost.get(neighbor, math.inf):
+                        g_cost[neighbor] = g
+                        parent[neighbor] = (current, kind)
+                        open_list.push(neighbor, g + h(neighbor))
+                        if record: record(neighbor << 2 | PUSH)
+                if stats is not None: stats.expanded(len(edges), len(open_list))
+                if draw_callback and draw_callback(open_set=open_list.entries, closed_set=closed) is False:
+                    return None, expanded
+            if best_route is None:
+                return local_path, expanded
+            if stats is not None: stats.phase('refine')
+            path, refine_expanded = self._refine(best_route, start_parent, end_parent)
+            if stats is not None: stats.expansions += refine_expanded
+            return path, expanded + refine_expanded
+        finally:
+            if stats is not None: stats.end(open_list)
+
+    @staticmethod
+    def _route(parent, cell):
+        route = []
+        while cell is not None:
+            previous, kind = parent[cell]
+            route.append((cell, kind))
+            cell = previous
+        return route[::-1]
+
+    @staticmethod
+    def _cells_from(parent, cell):
+        """ Follows a parent map from cell until it runs out; returns the visited cells. """
+        cells = []
+        while cell is not None:
+            cells.append(cell)
+            cell = parent[cell]
+        return cells
+
+    def _refine(self, route, start_parent, end_parent):
+        """ Expands abstract hops into grid cells, searching only inside the clusters the route uses. """
+        path, expanded = [route[0][0]], 0
+        for (previous, _), (cell, kind) in zip(route, route[1:]):
+            if kind == 'start':
+                path += self._cells_from(start_parent, cell)[::-1][1:]
+            elif kind == 'inter':
+                path.append(cell)
+            else:
+                cluster_edges = self._cluster_edges(self.cluster_of(previous))
+                _, parent, searched = self._cluster_search(cluster_edges, previous, stop_at=cell)
+                expanded += searched
+                path += self._cells_from(parent, cell)[::-1][1:]
+        # end_parent points from each cell of the end cluster towards the end.
+        path += self._cells_from(end_parent, path[-1])[1:]
+        return path, expanded
+
+def hpa_star_search(draw_callback, grid, start_node, end_node, hierarchy=None, trace=None, stats=None):
+    """
+    Hierarchical pathfinding (HPA*). Pass a HierarchicalGrid built once for the grid
+    to reuse its abstract graph across queries; otherwise one is built per call.
+    Paths are approximate: the cheapest route through the cluster entrances, or a
+    direct path when start and end are in the same or adjacent clusters.
+    """
+    owned = hierarchy is None
+    if owned:
+        hierarchy = HierarchicalGrid(grid)
+    try:
+        cells, explored = hierarchy.find_path(start_node.id, end_node.id, draw_callback, trace, stats)
+    finally:
+        if owned:
+            hierarchy.close()
+    if cells is None:
+        return False, {}, explored
+    return True, [grid.node(cell) for cell in cells], explored
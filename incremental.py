@@ -0,0 +1,251 @@
+import heapq
+import math
+
+from heuristics import DistanceHeuristic, resolve_heuristic
+from search_trace import EXPAND, PUSH
+
+class DStarLite:
+    """
+    Incremental planner (D* Lite) between a moving start and a fixed goal.
+
+    The search runs backward from the goal and keeps its state between calls:
+    g is the settled cost-to-goal of a cell and rhs its one-step lookahead
+    (min over successors of step cost + g). Cells where the two disagree sit on the
+    open list under the key (min(g, rhs) + h(start, cell) + km, min(g, rhs)).
+    Keys are pairs, so the open list is a heap of (key, cell) with lazy deletion
+    against `open_keys` rather than an OpenList, whose entries are keyed on f alone.
+
+    The planner registers itself as a grid listener and only records the cells that
+    changed; the next plan() recomputes rhs for those cells and their neighbors and
+    re-expands just the part of the tree whose costs moved. move_start() advances
+    the agent: instead of re-keying the open list, the heuristic drift is folded
+    into the km offset.
+
+    Only geometric heuristics (heuristics.DistanceHeuristic) can be used, since
+    their values do not depend on the map. They are scaled by the cheapest terrain,
+    so an edit that lowers that minimum resets the search; when it rises the old
+    scale is kept, which still gives a lower bound.
+    """
+    def __init__(self, grid, start, goal, heuristic='octile'):
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.heuristic = resolve_heuristic(heuristic)
+        if not isinstance(self.heuristic, DistanceHeuristic):
+            raise ValueError("DStarLite needs a DistanceHeuristic; landmark tables change with the map")
+        self._pending = set()
+        self._record = None  # trace append while a plan() is being traced
+        self._stats = None   # SearchStats while a plan() is being measured
+        self.reset()
+        grid.add_listener(self._on_grid_changed)
+
+    def close(self):
+        """ Stops tracking grid edits. """
+        self.grid.remove_listener(self._on_grid_changed)
+
+    def reset(self):
+        """ Drops all search state; the next plan() searches from scratch. """
+        self.g = {}
+        self.rhs = {self.goal: 0.0}
+        self.km = 0.0
+        self._heap = []
+        self.open_keys = {}
+        self._pending = set()
+        self._terrain_scale = self.grid.min_terrain_cost()
+        self._h = self.heuristic.bind(self.grid, self.start, reverse=True, terrain_scale=self._terrain_scale)
+        self._push(self.goal)
+
+    def _on_grid_changed(self, cells):
+        if cells is None:
+            self._pending = None
+        elif self._pending is not None:
+            self._pending.update(cells)
+
+    # --- Core ---
+    def _key(self, cell):
+        m = min(self.g.get(cell, math.inf), self.rhs.get(cell, math.inf))
+        return m + self._h(cell) + self.km, m
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self.open_keys[cell] = key
+        heapq.heappush(self._heap, (key, cell))
+        if self._record: self._record(cell << 2 | PUSH)
+        if self._stats is not None: self._stats.pushes += 1
+
+    def _top(self):
+        heap, open_keys = self._heap, self.open_keys
+        while heap:
+            key, cell = heap[0]
+            if open_keys.get(cell) == key:
+                return key, cell
+            heapq.heappop(heap)
+            if self._stats is not None: self._stats.stale_pops += 1
+        return None
+
+    def _update_vertex(self, cell):
+        if self.g.get(cell, math.inf) != self.rhs.get(cell, math.inf):
+            self._push(cell)
+        else:
+            self.open_keys.pop(cell, None)
+
+    def _lookahead(self, cell):
+        """ rhs from scratch: cheapest step cost + g over the successors of cell. """
+        grid = self.grid
+        if grid.obstacles[cell]:
+            return math.inf
+        g, terrain = self.g, grid.terrain
+        best = math.inf
+        for offset, distance in grid.moves[grid.adjacency[cell]]:
+            successor = cell + offset
+            cost = distance * terrain[successor] + g.get(successor, math.inf)
+            if cost < best:
+                best = cost
+        return best
+
+    def _apply_changes(self):
+        grid = self.grid
+        # A higher cheapest terrain leaves the old, smaller scale admissible; only a lower one resets.
+        if self._pending is None or grid.min_terrain_cost() < self._terrain_scale:
+            self.reset()
+            return
+        affected = set()
+        for cell in self._pending:
+            # Edges into and out of the cell changed; the adjacency mask of a cell
+            # lists its walkable neighbors whether or not the cell itself is blocked.
+            affected.add(cell)
+            for offset, _ in grid.moves[grid.adjacency[cell]]:
+                affected.add(cell + offset)
+        self._pending.clear()
+        for cell in affected:
+            if cell != self.goal:
+                self.rhs[cell] = self._lookahead(cell)
+                self._update_vertex(cell)
+
+    def _compute_shortest_path(self, draw_callback=None):
+        grid, g, rhs, open_keys = self.grid, self.g, self.rhs, self.open_keys
+        terrain, moves, adjacency = grid.terrain, grid.moves, grid.adjacency
+        start, goal = self.start, self.goal
+        stats = self._stats
+        expanded = set()
+        expansions = 0
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            k_old, cell = top
+            if k_old >= self._key(start) and rhs.get(start, math.inf) <= g.get(start, math.inf):
+                break
+            k_new = self._key(cell)
+            if k_old < k_new:
+                self._push(cell)
+                continue
+            expanded.add(cell)
+            expansions += 1
+            del open_keys[cell]
+            if self._record: self._record(cell << 2 | EXPAND)
+            g_old = g.get(cell, math.inf)
+            # Predecessors of cell are its walkable neighbors; the step onto cell
+            # pays cell's terrain.
+            enter_cost = terrain[cell]
+            if g_old > rhs[cell]:
+                g[cell] = g_new = rhs[cell]
+                for offset, distance in moves[adjacency[cell]]:
+                    predecessor = cell + offset
+                    cost = distance * enter_cost + g_new
+                    if predecessor != goal and cost < rhs.get(predecessor, math.inf):
+                        rhs[predecessor] = cost
+                        self._update_vertex(predecessor)
+            else:
+                g[cell] = math.inf
+                for offset, distance in moves[adjacency[cell]]:
+                    predecessor = cell + offset
+                    if predecessor != goal and rhs.get(predecessor, math.inf) == distance * enter_cost + g_old:
+                        rhs[predecessor] = self._lookahead(predecessor)
+                    self._update_vertex(predecessor)
+                if cell != goal:
+                    rhs[cell] = self._lookahead(cell)
+                self._update_vertex(cell)
+            if stats is not None:
+                # The expanded cell's heap entry is left behind to go stale; count it as the pop.
+                stats.pops += 1
+                stats.expanded(len(moves[adjacency[cell]]), len(open_keys))
+            if draw_callback and draw_callback(open_set=open_keys, closed_set=expanded) is False:
+                return None
+        # A cell can be expanded twice (lowered, then raised), so count expansions, not cells.
+        return expansions
+
+    # --- Queries ---
+    def move_start(self, cell):
+        """ Moves the agent; later plans reuse the tree built for the old start. """
+        if cell == self.start:
+            return
+        self.km += self._h(cell)
+        self.start = cell
+        self._h = self.heuristic.bind(self.grid, cell, reverse=True, terrain_scale=self._terrain_scale)
+
+    def plan(self, draw_callback=None, trace=None, stats=None):
+        """
+        Applies the edits seen since the last call and repairs the search tree.
+        Returns (path as cell ids or None, expanded count). A trace records only
+        the work done by this call, not the tree it repairs.
+        """
+        grid, start, goal = self.grid, self.start, self.goal
+        self._record = trace.events.append if trace is not None else None
+        self._stats = stats
+        if stats is not None: stats.begin('repair')
+        try:
+            self._apply_changes()
+            if grid.obstacles[start] or grid.obstacles[goal] or not grid.reachable(start, goal):
+                return None, 0
+            if stats is not None: stats.phase('search')
+            expanded = self._compute_shortest_path(draw_callback)
+            if expanded is None:
+                # Cancelled by the callback; the search state stays valid for the next plan().
+                return None, 0
+            if self.rhs.get(start, math.inf) == math.inf:
+                return None, expanded
+            if stats is not None: stats.phase('path')
+            return self._follow_path(), expanded
+        finally:
+            self._record = self._stats = None
+            if stats is not None: stats.end()
+
+    def _follow_path(self):
+        # Follow the cheapest successor from the start. The search may stop with the
+        # start itself unsettled (rhs < g), but the g of every successor it picks is exact.
+        grid, g, terrain = self.grid, self.g, self.grid.terrain
+        path = [self.start]
+        cell = self.start
+        while cell != self.goal:
+            best, best_cost = None, math.inf
+            for offset, distance in grid.moves[grid.adjacency[cell]]:
+                successor = cell + offset
+                cost = distance * terrain[successor] + g.get(successor, math.inf)
+                if cost < best_cost:
+                    best, best_cost = successor, cost
+            if best is None or len(path) > grid.size:
+                return None
+            path.append(best)
+            cell = best
+        return path
+
+def d_star_lite_search(draw_callback, grid, start_node, end_node, planner=None, trace=None, stats=None):
+    """
+    D* Lite. Pass a DStarLite kept across calls to replan incrementally after grid
+    edits or after moving the start; without one, each call plans from scratch.
+    """
+    owned = planner is None
+    if owned:
+        planner = DStarLite(grid, start_node.id, end_node.id)
+    elif planner.goal != end_node.id:
+        raise ValueError("planner was built for a different goal")
+    try:
+        planner.move_start(start_node.id)
+        cells, explored = planner.plan(draw_callback, trace, stats)
+    finally:
+        if owned:
+            planner.close()
+    if cells is None:
+        return False, {}, explored
+    return True, [grid.node(cell) for cell in cells], explored
@@ -0,0 +1,198 @@
+from array import array
+
+import numpy as np
+
+from grid import DIRECTIONS
+
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+class JumpPointTable:
+    """
+    JPS+ preprocessing: for every cell and each of the 8 directions, the distance
+    along that direction to the next jump point (stored as a positive number) or to
+    the last walkable cell before a wall or the grid edge (stored as zero or a
+    negative number). Jump points follow the same rules as algorithms._jump, so
+    jps_search(..., jump_table=table) expands exactly the same successors as the
+    plain search, with each jump answered by a table lookup.
+
+    The table registers itself as a grid listener: an obstacle edit repairs only the
+    entries whose value actually changes, walking back along each affected ray from
+    the 3x3 neighborhood of the edit until the stored values stop changing. On open
+    maps one edit can shift entries across much of the grid; once a repair has
+    rewritten more than REPAIR_BUDGET of the cells it falls back to rebuild(), whose
+    vectorized sweeps are cheaper than that many scalar updates.
+    """
+    REPAIR_BUDGET = 1 / 16
+    def __init__(self, grid):
+        self.grid = grid
+        self.table = array('i', bytes(4 * 8 * grid.size))
+        self.rebuild()
+        grid.add_listener(self._on_grid_changed)
+
+    def close(self):
+        """ Stops tracking grid edits. """
+        self.grid.remove_listener(self._on_grid_changed)
+
+    # --- Building ---
+    def rebuild(self):
+        """ Recomputes every entry with vectorized sweeps (one per row or column per direction). """
+        grid = self.grid
+        rows, cols = grid.rows, grid.cols
+        walkable = np.zeros((rows + 2, cols + 2), dtype=bool)
+        walkable[1:-1, 1:-1] = grid.obstacle_array() == 0
+        tables = {}
+        # Straight directions first: diagonal jump points depend on the straight tables.
+        for dr, dc in sorted(DIRECTIONS, key=lambda d: d[0] != 0 and d[1] != 0):
+            is_jump = self._forced_array(walkable, dr, dc)
+            if dr != 0 and dc != 0:
+                is_jump |= tables[(dr, 0)] > 0
+                is_jump |= tables[(0, dc)] > 0
+            tables[(dr, dc)] = self._sweep(walkable, is_jump, dr, dc)
+        view = np.frombuffer(self.table, dtype=np.int32).reshape(8, rows, cols)
+        for d, direction in enumerate(DIRECTIONS):
+            view[d] = tables[direction][1:-1, 1:-1]
+
+    @staticmethod
+    def _forced_array(walkable, dr, dc):
+        """ Padded bool array: the cell has a forced neighbor when entered moving (dr, dc). """
+        rows, cols = walkable.shape[0] - 2, walkable.shape[1] - 2
+        def at(a, b):
+            # at(a, b)[r, c] == walkable(r + a, c + b) for every padded interior cell.
+            return walkable[1 + a:1 + a + rows, 1 + b:1 + b + cols]
+        forced = np.zeros_like(walkable)
+        if dr != 0 and dc != 0:
+            inner = (~at(-dr, 0) & at(-dr, dc)) | (~at(0, -dc) & at(dr, -dc))
+        elif dr != 0:
+            inner = (~at(0, 1) & at(dr, 1)) | (~at(0, -1) & at(dr, -1))
+        else:
+            inner = (~at(1, 0) & at(1, dc)) | (~at(-1, 0) & at(-1, dc))
+        forced[1:-1, 1:-1] = inner
+        return forced
+
+    @staticmethod
+    def _sweep(walkable, is_jump, dr, dc):
+        """ Fills one direction's padded table, walking against the direction of travel. """
+        rows, cols = walkable.shape[0] - 2, walkable.shape[1] - 2
+        table = np.zeros(walkable.shape, dtype=np.int32)
+        if dr != 0:
+            order = range(rows, 0, -1) if dr > 0 else range(1, rows + 1)
+            for r in order:
+                nxt = slice(1 + dc, 1 + dc + cols)
+                step = table[r + dr, nxt]
+                table[r, 1:-1] = np.where(~walkable[r + dr, nxt], 0,
+                                          np.where(is_jump[r + dr, nxt], 1, np.where(step > 0, step + 1, step - 1)))
+        else:
+            order = range(cols, 0, -1) if dc > 0 else range(1, cols + 1)
+            for c in order:
+                step = table[1:-1, c + dc]
+                table[1:-1, c] = np.where(~walkable[1:-1, c + dc], 0,
+                                          np.where(is_jump[1:-1, c + dc], 1, np.where(step > 0, step + 1, step - 1)))
+        return table
+
+    # --- Incremental repair ---
+    def _walkable(self, row, col):
+        grid = self.grid
+        return 0 <= row < grid.rows and 0 <= col < grid.cols and not grid.obstacles[row * grid.cols + col]
+
+    def _is_jump(self, row, col, dr, dc):
+        w = self._walkable
+        if dr != 0 and dc != 0:
+            if (not w(row - dr, col) and w(row - dr, col + dc)) or (not w(row, col - dc) and w(row + dr, col - dc)):
+                return True
+            cell, size = row * self.grid.cols + col, self.grid.size
+            return (self.table[DIRECTION_INDEX[(dr, 0)] * size + cell] > 0 or
+                    self.table[DIRECTION_INDEX[(0, dc)] * size + cell] > 0)
+        if dr != 0:
+            return (not w(row, col + 1) and w(row + dr, col + 1)) or (not w(row, col - 1) and w(row + dr, col - 1))
+        return (not w(row + 1, col) and w(row + 1, col + dc)) or (not w(row - 1, col) and w(row - 1, col + dc))
+
+    def _entry(self, row, col, d):
+        dr, dc = DIRECTIONS[d]
+        nr, nc = row + dr, col + dc
+        if not self._walkable(nr, nc):
+            return 0
+        if self._is_jump(nr, nc, dr, dc):
+            return 1
+        step = self.table[d * self.grid.size + nr * self.grid.cols + nc]
+        return step + 1 if step > 0 else step - 1
+
+    def _repair(self, seeds, directions, budget):
+        """
+        Recomputes entries upstream of the seed cells and returns the cells whose
+        entries changed, or None once more than `budget` entries have been rewritten.
+        """
+        grid, table = self.grid, self.table
+        changed = set()
+        for d in directions:
+            dr, dc = DIRECTIONS[d]
+            base = d * grid.size
+            for seed_row, seed_col in seeds:
+                row, col = seed_row - dr, seed_col - dc
+                while 0 <= row < grid.rows and 0 <= col < grid.cols:
+                    value = self._entry(row, col, d)
+                    index = base + row * grid.cols + col
+                    if table[index] == value:
+                        break
+                    table[index] = value
+                    changed.add((row, col))
+                    budget -= 1
+                    if budget < 0:
+                        return None
+                    row, col = row - dr, col - dc
+        return changed
+
+    def _on_grid_changed(self, cells):
+        if cells is None:
+            self.rebuild()
+            return
+        grid = self.grid
+        seeds = set()
+        for cell in cells:
+            row, col = divmod(cell, grid.cols)
+            for r in range(row - 1, row + 2):
+                for c in range(col - 1, col + 2):
+                    if 0 <= r < grid.rows and 0 <= c < grid.cols:
+                        seeds.add((r, c))
+        straight = [d for d, (dr, dc) in enumerate(DIRECTIONS) if dr == 0 or dc == 0]
+        diagonal = [d for d, (dr, dc) in enumerate(DIRECTIONS) if dr != 0 and dc != 0]
+        budget = max(64, int(grid.size * self.REPAIR_BUDGET))
+        changed = self._repair(seeds, straight, budget)
+        if changed is None or self._repair(seeds | changed, diagonal, budget - len(changed)) is None:
+            self.rebuild()
+
+    # --- Queries ---
+    def jump(self, cell, d, end):
+        """ Table-driven equivalent of algorithms._jump from `cell` in direction index d. """
+        grid = self.grid
+        cols, size = grid.cols, grid.size
+        dr, dc = DIRECTIONS[d]
+        offset = dr * cols + dc
+        value = self.table[d * size + cell]
+        reach = value if value > 0 else -value
+        row, col = divmod(cell, cols)
+        end_row, end_col = divmod(end, cols)
+        if dr == 0 or dc == 0:
+            # The goal stops a straight jump if it lies on the ray within reach.
+            if dr == 0:
+                steps = (end_col - col) * dc if end_row == row else 0
+            else:
+                steps = (end_row - row) * dr if end_col == col else 0
+            if 0 < steps <= reach:
+                return end
+            return cell + value * offset if value > 0 else None
+        # A diagonal jump also stops at the first diagonal cell whose horizontal or
+        # vertical ray reaches the goal before hitting a wall.
+        best = None
+        for i, ray, gap in (((end_row - row) * dr, DIRECTION_INDEX[(0, dc)], (end_col - col) * dc),
+                            ((end_col - col) * dc, DIRECTION_INDEX[(dr, 0)], (end_row - row) * dr)):
+            if not 1 <= i <= reach or (best is not None and i >= best):
+                continue
+            steps = gap - i
+            if steps < 0:
+                continue
+            ray_value = self.table[ray * size + cell + i * offset]
+            if steps == 0 or ray_value > 0 or steps <= -ray_value:
+                best = i
+        if best is not None:
+            return cell + best * offset
+        return cell + value * offset if value > 0 else None
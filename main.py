@@ -1,33 +1,60 @@
-import pygame
+import argparse
 import time
 import textwrap
-import matplotlib.pyplot as plt
+
 import numpy as np
 
-from grid import Grid, Node
+from grid import Grid
 from algorithms import a_star_search, dijkstra_search, weighted_a_star_search, jps_search, theta_star_search, bidirectional_search
+from hpa import hpa_star_search
+from incremental import DStarLite, d_star_lite_search
+from anytime import ara_star_search
+from path_cache import PathCache
+from map_io import save_grid, load_grid
+from search_trace import SearchTrace, TracePlayer, save_trace
+from stats import SearchStats
 
 # --- Constants ---
+SAVE_PATH = "saved_grid.bin"
+TRACE_PATH = "saved_trace.bin"
+REPLAY_SECONDS = 5  # a replay starts at the speed that plays the whole trace in this time
 WIDTH, HEIGHT = 600, 780
 WHITE, BLACK, GREY = (255, 255, 255), (0, 0, 0), (128, 128, 128)
 GREEN, RED, BLUE = (0, 255, 0), (255, 0, 0), (64, 200, 224)
 TURQUOISE, ORANGE = (175, 238, 238), (255, 215, 180)
 ORANGE_FWD, ORANGE_BWD = (255, 200, 100), (255, 150, 50)
 SWAMP_GREEN, ROAD_YELLOW = (52, 84, 46), (214, 201, 142)
+TARGET_FPS = 60
+MIN_LINE_GAP = 4  # cells narrower than this (in pixels) are drawn without grid lines
+# Renderer layers, bottom to top: closed, closed (forward), closed (backward), open,
+# open (backward), path, start, end. Reversed, the search layers start at index 3.
+LAYER_COLORS = (ORANGE, ORANGE_FWD, ORANGE_BWD, TURQUOISE, TURQUOISE, BLUE, GREEN, RED)
+SEARCH_LAYERS_FROM = 3
 
 # --- Pygame Setup ---
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Pathfinding Visualizer")
-pygame.font.init()
-FONT = pygame.font.SysFont('arial', 18)
-SMALL_FONT = pygame.font.SysFont('arial', 14)
+# pygame and matplotlib are imported on first use so that importing this module
+# (for run_benchmark, say) stays cheap and works without a display.
+pygame = None
+WIN = FONT = SMALL_FONT = None
+
+def _init_pygame():
+    global pygame, WIN, FONT, SMALL_FONT
+    if pygame is None:
+        import pygame as pg
+        pygame = pg
+        WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Pathfinding Visualizer")
+        pygame.font.init()
+        FONT = pygame.font.SysFont('arial', 18)
+        SMALL_FONT = pygame.font.SysFont('arial', 14)
+    return WIN
 
 class HintController:
     """Keeps track of the step-by-step guidance shown at the bottom of the UI."""
     HINT_STEPS = [
         {"title": "Place Start Node", "detail": "Left-click any tile to drop the green START node."},
         {"title": "Place End Node", "detail": "Left-click another tile that is not blocked to mark the red END node."},
-        {"title": "Prep the Grid", "detail": "Pick an algorithm with A/D/W/J/T/B, then drag while holding 1/2/0 to paint terrain before running {algo}."},
+        {"title": "Prep the Grid", "detail": "Pick an algorithm with A/D/W/J/T/B/G/I/Y, then drag while holding 1/2/0 to paint terrain before running {algo}."},
         {"title": "Run & Iterate", "detail": "Press SPACE to visualize {algo}. Review the metrics, press X to benchmark, or C to reset and try again."}
     ]
 
@@ -76,38 +103,103 @@ class HintController:
 # --- Drawing and Helper Functions ---
 def get_clicked_pos(pos, rows, width):
     gap = width // rows; x, y = pos
-    if y >= width: return -1, -1
+    if y >= gap * rows or x >= gap * rows: return -1, -1
     return y // gap, x // gap
-def draw_nodes(win, grid_obj, rows, width, start_node=None, end_node=None, open_set=None, closed_set=None, path=None, open_set_bwd=None, closed_set_fwd=None, closed_set_bwd=None):
-    gap = width // rows
-    open_set, closed_set = open_set or set(), closed_set or set()
-    closed_set_fwd, closed_set_bwd = closed_set_fwd or set(), closed_set_bwd or set()
-    open_set_bwd = open_set_bwd or set()
-    path = path or []
-    for row in grid_obj.grid:
-        for node in row:
-            if node.terrain_cost == 5: color = SWAMP_GREEN
-            elif node.terrain_cost == 0.5: color = ROAD_YELLOW
-            else: color = WHITE
-            if closed_set_fwd:
-                if node in closed_set_fwd: color = ORANGE_FWD
-                if node in closed_set_bwd: color = ORANGE_BWD
-            else:
-                if node in closed_set: color = ORANGE
-            if node in open_set or node in open_set_bwd: color = TURQUOISE
-            if node.is_obstacle: color = BLACK
-            pygame.draw.rect(win, color, (node.col * gap, node.row * gap, gap, gap))
-    for node in path:
-        pygame.draw.rect(win, BLUE, (node.col * gap, node.row * gap, gap, gap))
-    if start_node: pygame.draw.rect(win, GREEN, (start_node.col * gap, start_node.row * gap, gap, gap))
-    if end_node: pygame.draw.rect(win, RED, (end_node.col * gap, end_node.row * gap, gap, gap))
-def draw_grid_lines(win, rows, width):
-    gap = width // rows
-    for i in range(rows):
-        pygame.draw.line(win, GREY, (0, i * gap), (width, i * gap))
-        for j in range(rows):
-            pygame.draw.line(win, GREY, (j * gap, 0), (j * gap, width))
-def draw(win, grid_obj, rows, width, start_node=None, end_node=None, open_set=None, closed_set=None, path=None, algo_name="", metrics=None, open_set_bwd=None, closed_set_fwd=None, closed_set_bwd=None, hint_payload=None, hints_visible=True, benchmark_overlay=None):
+
+class GridRenderer:
+    """
+    Draws the grid area from a cached surface. Grid lines are drawn onto it once, and
+    each frame repaints only the cells whose color changed since the previous frame:
+    cells entering or leaving the open/closed sets, the path and the endpoints, plus
+    cells reported by the grid's change listener. should_draw() throttles search
+    callbacks to TARGET_FPS so the search runs at full speed between frames.
+    """
+    def __init__(self, grid, width):
+        self.width = width
+        self.grid = None
+        self._next_frame = 0.0
+        self.set_grid(grid)
+
+    def set_grid(self, grid):
+        if self.grid is not None:
+            self.grid.remove_listener(self._on_change)
+        self.grid = grid
+        grid.add_listener(self._on_change)
+        self.gap = max(1, self.width // grid.rows)
+        self.lines = self.gap >= MIN_LINE_GAP
+        self.surface = pygame.Surface((grid.cols * self.gap, grid.rows * self.gap))
+        self._layers = [set()] * len(LAYER_COLORS)  # cells drawn per layer last frame
+        self._base_dirty = None  # cells whose terrain or obstacle changed; None repaints all
+
+    def close(self):
+        self.grid.remove_listener(self._on_change)
+
+    def _on_change(self, cells):
+        if cells is None:
+            self._base_dirty = None
+        elif self._base_dirty is not None:
+            self._base_dirty.update(cells)
+
+    def should_draw(self):
+        # Frames are spaced from the end of the previous render, so the search always
+        # gets at least one frame interval of its own however long a frame takes.
+        return time.perf_counter() >= self._next_frame
+
+    def _base_color(self, cell):
+        if self.grid.obstacles[cell]: return BLACK
+        terrain = self.grid.terrain[cell]
+        if terrain == 5: return SWAMP_GREEN
+        if terrain == 0.5: return ROAD_YELLOW
+        return WHITE
+
+    def _repaint_all(self):
+        grid, gap = self.grid, self.gap
+        colors = np.empty((grid.rows, grid.cols, 3), dtype=np.uint8)
+        colors[:] = WHITE
+        terrain = grid.terrain_array()
+        colors[terrain == 5] = SWAMP_GREEN
+        colors[terrain == 0.5] = ROAD_YELLOW
+        colors[grid.obstacle_array() != 0] = BLACK
+        pixels = colors.repeat(gap, axis=0).repeat(gap, axis=1)
+        if self.lines:
+            pixels[::gap, :] = GREY
+            pixels[:, ::gap] = GREY
+        pygame.surfarray.blit_array(self.surface, pixels.transpose(1, 0, 2))
+
+    def render(self, win, start_node=None, end_node=None, open_set=None, closed_set=None, path=None, open_set_bwd=None, closed_set_fwd=None, closed_set_bwd=None):
+        # One snapshot per layer, later layers drawn over earlier ones; a cell needs
+        # repainting only if it entered or left some layer since the last frame.
+        layers = [set(cells) if cells else set() for cells in (closed_set, closed_set_fwd, closed_set_bwd, open_set, open_set_bwd)]
+        layers.append({node.id for node in path} if path else set())
+        layers.append({start_node.id} if start_node else set())
+        layers.append({end_node.id} if end_node else set())
+        if self._base_dirty is None:
+            self._repaint_all()
+            dirty = set().union(*layers)
+        else:
+            dirty = self._base_dirty
+            for new, old in zip(layers, self._layers):
+                dirty |= new ^ old
+        self._layers, self._base_dirty = layers, set()
+        obstacles = self.grid.obstacles
+        gap, cols = self.gap, self.grid.cols
+        inset = 1 if self.lines else 0
+        fill = self.surface.fill
+        stacked = list(zip(layers, LAYER_COLORS))[::-1]
+        for cell in dirty:
+            row, col = divmod(cell, cols)
+            color = None
+            for index, (cells, layer_color) in enumerate(stacked):
+                if cell in cells:
+                    # Obstacles hide search state but not the path or the endpoints.
+                    if not (obstacles[cell] and index >= SEARCH_LAYERS_FROM):
+                        color = layer_color
+                    break
+            fill(color or self._base_color(cell), (col * gap + inset, row * gap + inset, gap - inset, gap - inset))
+        win.blit(self.surface, (0, 0))
+        self._next_frame = time.perf_counter() + 1 / TARGET_FPS
+
+def draw(win, renderer, width, start_node=None, end_node=None, open_set=None, closed_set=None, path=None, algo_name="", metrics=None, open_set_bwd=None, closed_set_fwd=None, closed_set_bwd=None, hint_payload=None, hints_visible=True, benchmark_overlay=None, replay_status=None):
     win.fill(WHITE)
     draw_hint_callout(win, hint_payload, hints_visible, width)
     grid_area_height = width
@@ -116,20 +208,19 @@ def draw(win, grid_obj, rows, width, start_node=None, end_node=None, open_set=No
     if algo_name == "Jump Point Search":
         warning_text = SMALL_FONT.render("(NOTE: JPS ignores terrain costs)", True, RED)
         win.blit(warning_text, (info_text_1.get_width() + 15, grid_area_height + 8))
-    if algo_name == "Theta* (Any-Angle)":
-        warning_text = SMALL_FONT.render("(NOTE: Any-angle shortcuts may ignore some terrain costs)", True, (200, 100, 0))
-        win.blit(warning_text, (info_text_1.get_width() + 15, grid_area_height + 8))
+    if replay_status:
+        replay_text = SMALL_FONT.render(replay_status, True, BLUE)
+        win.blit(replay_text, (width - replay_text.get_width() - 10, grid_area_height + 8))
     info_text_2 = FONT.render("C: Clear | M: Maze | X: Benchmark | V: Toggle Stats | SPACE: Run", True, BLACK)
     win.blit(info_text_2, (10, grid_area_height + 25))
-    info_text_3 = FONT.render("Select: A/D/W/J/T/B | Paint: 1-Swamp 2-Road 0-Erase", True, BLACK)
+    info_text_3 = FONT.render("Select: A/D/W/J/T/B/G/I/Y | Paint: 1-Swamp 2-Road 0-Erase", True, BLACK)
     win.blit(info_text_3, (10, grid_area_height + 45))
     if metrics:
         metrics_text = FONT.render(f"Time: {metrics['time']:.4f}s | Path Length: {metrics['length']} | Nodes Explored: {metrics['explored']}", True, BLACK)
         win.blit(metrics_text, (10, grid_area_height + 65))
     if hint_payload:
         draw_hint_bar(win, hint_payload, width, grid_area_height + 95)
-    draw_nodes(win, grid_obj, rows, width, start_node, end_node, open_set, closed_set, path, open_set_bwd, closed_set_fwd, closed_set_bwd)
-    draw_grid_lines(win, rows, width)
+    renderer.render(win, start_node, end_node, open_set, closed_set, path, open_set_bwd, closed_set_fwd, closed_set_bwd)
     draw_benchmark_panel(win, benchmark_overlay, width)
 
 def draw_hint_bar(win, hint_payload, width, start_y):
@@ -182,7 +273,7 @@ def draw_benchmark_panel(win, overlay_data, width):
         return
     panel_width = min(330, width - 20)
     success = overlay_data.get("success", False)
-    base_height = 150 if success else 100
+    base_height = 160 if success else 100
     panel_height = base_height
     x = width - panel_width - 10
     y = 10
@@ -213,6 +304,12 @@ def draw_benchmark_panel(win, overlay_data, width):
             else:
                 path_surface = SMALL_FONT.render("Shortest path: N/A", True, WHITE)
             win.blit(path_surface, (x + 10, y + 68))
+            pushes_name, pushes_stats = min(results.items(), key=lambda item: item[1]["stats"]["pushes"])
+            pushes_surface = SMALL_FONT.render(f"Fewest heap pushes: {pushes_name} ({pushes_stats['stats']['pushes']})", True, WHITE)
+            win.blit(pushes_surface, (x + 10, y + 86))
+            peak_name, peak_stats = min(results.items(), key=lambda item: item[1]["stats"]["peak_open"])
+            peak_surface = SMALL_FONT.render(f"Smallest open list: {peak_name} (peak {peak_stats['stats']['peak_open']})", True, WHITE)
+            win.blit(peak_surface, (x + 10, y + 104))
         controls_surface = SMALL_FONT.render("X: re-run benchmark | V: Hide panel", True, (200, 200, 200))
         win.blit(controls_surface, (x + 10, y + panel_height - 22))
     else:
@@ -230,6 +327,7 @@ def draw_benchmark_panel(win, overlay_data, width):
 
 # Greatly improved plotting layout and style
 def visualize_benchmark_results(results):
+    import matplotlib.pyplot as plt
     names = list(results.keys())
     times = [res['time'] for res in results.values()]
     lengths = [res['path_len'] if res['path_len'] != "N/A" else 0 for res in results.values()]
@@ -270,40 +368,60 @@ def run_benchmark(grid, start_node, end_node, show_plot=True):
         warning = "Please set a start and end node first."
         print(f"\n[BENCHMARK FAILED] {warning}")
         return False, warning
-    algorithms_to_test = {"A*": a_star_search, "Dijkstra": dijkstra_search, "Weighted A*": weighted_a_star_search, "Theta*": theta_star_search, "Bidirectional": bidirectional_search, "JPS": jps_search}
+    algorithms_to_test = {"A*": a_star_search, "Dijkstra": dijkstra_search, "Weighted A*": weighted_a_star_search, "Theta*": theta_star_search, "Bidirectional": bidirectional_search, "JPS": jps_search, "HPA*": hpa_star_search, "D* Lite": d_star_lite_search, "ARA*": ara_star_search}
     results = {}
     for name, func in algorithms_to_test.items():
+        stats = SearchStats()
         start_time = time.perf_counter()
-        found, path, explored = func(None, grid, start_node, end_node)
+        found, path, explored = func(None, grid, start_node, end_node, stats=stats)
         end_time = time.perf_counter()
-        results[name] = {'time': (end_time - start_time) * 1000, 'path_len': len(path) if found else "N/A", 'explored': explored}
-    print("\n" + "="*50); print(" " * 15 + "BENCHMARK RESULTS"); print("="*50)
-    print(f"{'Algorithm':<15} | {'Time (ms)':<10} | {'Path Len':<10} | {'Explored':<10}"); print("-"*50)
+        results[name] = {'time': (end_time - start_time) * 1000, 'path_len': len(path) if found else "N/A", 'explored': explored, 'stats': stats.as_dict()}
+    print("\n" + "="*83); print(" " * 32 + "BENCHMARK RESULTS"); print("="*83)
+    print(f"{'Algorithm':<15} | {'Time (ms)':<10} | {'Path Len':<10} | {'Explored':<10} | {'Pushes':<8} | {'Stale':<8} | {'Peak Open':<9}"); print("-"*83)
     for name, res in results.items():
-        print(f"{name:<15} | {res['time']:<10.3f} | {str(res['path_len']):<10} | {res['explored']:<10}")
-    print("="*50)
+        stats = res['stats']
+        print(f"{name:<15} | {res['time']:<10.3f} | {str(res['path_len']):<10} | {res['explored']:<10} | {stats['pushes']:<8} | {stats['stale_pops']:<8} | {stats['peak_open']:<9}")
+    print("="*83)
     if show_plot:
         visualize_benchmark_results(results)
     return True, results
 
 # --- Main Application Loop ---
-def main(win, width):
-    GRID_WIDTH = width; ROWS = 40
+def main(win, width, rows=40):
+    GRID_WIDTH = width; ROWS = rows
     grid = Grid(ROWS, ROWS)
+    path_cache = PathCache(grid)
+    renderer = GridRenderer(grid, GRID_WIDTH)
+    clock = pygame.time.Clock()
     start_node, end_node = None, None
     run = True
     algorithm_func = a_star_search; algorithm_name = "A* Search"
+    planner = None  # D* Lite state kept between runs so edits are repaired, not replanned
+    last_trace, player, replay_playing, replay_speed = None, None, False, 1
+    replay_grid, replay_path = None, None  # (grid, version) the last trace was recorded on
     last_metrics = None
     benchmark_overlay = None
     hint_controller = HintController()
     while run:
         hint_controller.update(start_node, end_node, last_metrics)
         current_hint = hint_controller.get_payload(algorithm_name) if hint_controller.visible else None
-        if algorithm_name == "Bidirectional Search":
-             draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, closed_set_fwd=set(), closed_set_bwd=set(), hint_payload=current_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+        if last_trace is not None and replay_grid != (grid, grid.version):
+            # The grid was edited or replaced; the trace no longer matches it.
+            player, last_trace = None, None
+        if player is not None:
+            if replay_playing:
+                player.step(replay_speed)
+                replay_playing = not player.done
+            frontiers = {"open_set": player.open, "open_set_bwd": player.open_bwd, "closed_set_bwd": player.closed_bwd}
+            frontiers["closed_set_fwd" if player.closed_bwd else "closed_set"] = player.closed
+            status = f"Replay {player.position}/{len(player)} x{replay_speed}" + ("" if replay_playing else " (paused)")
+            draw(win, renderer, GRID_WIDTH, start_node, end_node, path=replay_path if player.done else None, algo_name=algorithm_name, metrics=last_metrics, hint_payload=current_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay, replay_status=status, **frontiers)
+        elif algorithm_name == "Bidirectional Search":
+             draw(win, renderer, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, closed_set_fwd=set(), closed_set_bwd=set(), hint_payload=current_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
         else:
-            draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, hint_payload=current_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+            draw(win, renderer, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, hint_payload=current_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
         pygame.display.update()
+        clock.tick(TARGET_FPS)
         for event in pygame.event.get():
             if event.type == pygame.QUIT: run = False
             if pygame.mouse.get_pressed()[0]:
@@ -346,6 +464,9 @@ def main(win, width):
                 if event.key == pygame.K_j: algorithm_func, algorithm_name = jps_search, "Jump Point Search"
                 if event.key == pygame.K_t: algorithm_func, algorithm_name = theta_star_search, "Theta* (Any-Angle)"
                 if event.key == pygame.K_b: algorithm_func, algorithm_name = bidirectional_search, "Bidirectional Search"
+                if event.key == pygame.K_g: algorithm_func, algorithm_name = hpa_star_search, "HPA* (Hierarchical)"
+                if event.key == pygame.K_i: algorithm_func, algorithm_name = d_star_lite_search, "D* Lite (Incremental)"
+                if event.key == pygame.K_y: algorithm_func, algorithm_name = ara_star_search, "ARA* (Anytime)"
                 if event.key == pygame.K_m:
                     grid.generate_maze()
                     start_node, end_node, last_metrics = None, None, None
@@ -364,30 +485,95 @@ def main(win, width):
                 if event.key == pygame.K_h: hint_controller.toggle_visibility()
                 if event.key == pygame.K_n: hint_controller.next_step()
                 if event.key == pygame.K_r: hint_controller.resume_auto()
+                if event.key == pygame.K_p:
+                    if last_trace is None:
+                        print("No trace to replay; press SPACE to run a search first")
+                    elif player is None or player.done:
+                        player, replay_playing = TracePlayer(last_trace), True
+                        replay_speed = max(1, len(last_trace) // (REPLAY_SECONDS * TARGET_FPS))
+                        replay_path = [grid.node(cell) for cell in last_trace.path] or None
+                    else:
+                        replay_playing = not replay_playing
+                if player is not None and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    # Scrub by 1% of the trace and pause.
+                    step = max(1, len(player) // 100)
+                    player.step(step if event.key == pygame.K_RIGHT else -step)
+                    replay_playing = False
+                if event.key == pygame.K_UP: replay_speed *= 2
+                if event.key == pygame.K_DOWN: replay_speed = max(1, replay_speed // 2)
+                if event.key == pygame.K_e:
+                    if last_trace is None:
+                        print("No trace to save; press SPACE to run a search first")
+                    else:
+                        save_trace(last_trace, TRACE_PATH)
+                        print(f"Saved trace ({len(last_trace)} events) to {TRACE_PATH}")
                 if event.key == pygame.K_SPACE and start_node and end_node:
+                    player, replay_playing = None, False
+                    trace = SearchTrace(grid.rows, grid.cols)
                     start_time = time.time()
                     def callback_handler(*args, **kwargs):
+                        nonlocal run
+                        if not renderer.should_draw():
+                            return
+                        # The searches do no event handling; pump events here so the window
+                        # stays responsive, and cancel the search if it is closed.
+                        for pending in pygame.event.get():
+                            if pending.type == pygame.QUIT:
+                                run = False
+                                return False
                         hint_payload = hint_controller.get_payload(algorithm_name) if hint_controller.visible else None
                         if algorithm_name == "Bidirectional Search":
-                            draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, open_set=args[0], closed_set_fwd=args[1], open_set_bwd=args[2], closed_set_bwd=args[3], algo_name=algorithm_name, hint_payload=hint_payload, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+                            draw(win, renderer, GRID_WIDTH, start_node, end_node, open_set=args[0], closed_set_fwd=args[1], open_set_bwd=args[2], closed_set_bwd=args[3], algo_name=algorithm_name, hint_payload=hint_payload, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
                         else:
-                            draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, **kwargs, algo_name=algorithm_name, hint_payload=hint_payload, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+                            draw(win, renderer, GRID_WIDTH, start_node, end_node, **kwargs, algo_name=algorithm_name, hint_payload=hint_payload, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
                         pygame.display.update()
-                    found, path, total_explored = algorithm_func(callback_handler, grid, start_node, end_node)
+                    if algorithm_func is d_star_lite_search:
+                        if planner is None or planner.grid is not grid or planner.goal != end_node.id:
+                            if planner: planner.close()
+                            planner = DStarLite(grid, start_node.id, end_node.id)
+                        found, path, total_explored = d_star_lite_search(callback_handler, grid, start_node, end_node, planner=planner, trace=trace)
+                    else:
+                        found, path, total_explored = path_cache.search(algorithm_func, callback_handler, grid, start_node, end_node, trace=trace)
                     end_time = time.time()
+                    if not run:
+                        break
+                    if found:
+                        trace.path.extend(node.id for node in path)
+                    # A cache hit records nothing; keep no trace rather than an empty one.
+                    last_trace = trace if len(trace) else None
+                    replay_grid = (grid, grid.version)
                     path_length = len(path) if found else "N/A"
                     last_metrics = { "time": end_time - start_time, "length": path_length, "explored": total_explored }
                     hint_controller.update(start_node, end_node, last_metrics)
                     post_run_hint = hint_controller.get_payload(algorithm_name) if hint_controller.visible else None
                     if found:
-                        draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, path=path, algo_name=algorithm_name, metrics=last_metrics, hint_payload=post_run_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+                        draw(win, renderer, GRID_WIDTH, start_node, end_node, path=path, algo_name=algorithm_name, metrics=last_metrics, hint_payload=post_run_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
                     else:
-                        draw(win, grid, ROWS, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, hint_payload=post_run_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
+                        draw(win, renderer, GRID_WIDTH, start_node, end_node, algo_name=algorithm_name, metrics=last_metrics, hint_payload=post_run_hint, hints_visible=hint_controller.visible, benchmark_overlay=benchmark_overlay)
                     pygame.display.update()
                 if event.key == pygame.K_c:
                     grid = Grid(ROWS, ROWS)
+                    path_cache = PathCache(grid)
+                    renderer.set_grid(grid)
                     start_node, end_node, last_metrics = None, None, None
                     benchmark_overlay = None
+                if event.key == pygame.K_s:
+                    save_grid(grid, SAVE_PATH)
+                    print(f"Saved grid to {SAVE_PATH}")
+                if event.key == pygame.K_l:
+                    try:
+                        loaded = load_grid(SAVE_PATH)
+                    except (OSError, ValueError) as error:
+                        print(f"Could not load {SAVE_PATH}: {error}")
+                    else:
+                        if (loaded.rows, loaded.cols) != (ROWS, ROWS):
+                            print(f"{SAVE_PATH} is {loaded.rows}x{loaded.cols}; the visualizer needs {ROWS}x{ROWS}")
+                        else:
+                            grid = loaded
+                            path_cache = PathCache(grid)
+                            renderer.set_grid(grid)
+                            start_node, end_node, last_metrics = None, None, None
+                            benchmark_overlay = None
         keys = pygame.key.get_pressed(); mouse_buttons = pygame.mouse.get_pressed()
         if mouse_buttons[0]:
             pos = pygame.mouse.get_pos(); row, col = get_clicked_pos(pos, ROWS, GRID_WIDTH)
@@ -413,4 +599,7 @@ def main(win, width):
     pygame.quit()
 
 if __name__ == "__main__":
-    main(WIN, WIDTH)
+    parser = argparse.ArgumentParser(description="Interactive pathfinding visualizer.")
+    parser.add_argument('--rows', type=int, default=40, help="grid size (rows and columns)")
+    args = parser.parse_args()
+    main(_init_pygame(), WIDTH, args.rows)
@@ -0,0 +1,132 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from grid import Grid
+
+# --- Binary grid format ---
+# A 32-byte header followed by the three per-cell buffers of a Grid:
+#
+#     magic (8s) | format version (uint32) | rows (uint32) | cols (uint32) | reserved
+#     obstacles: rows * cols bytes
+#     adjacency: rows * cols bytes
+#     padding to a multiple of 4
+#     terrain:   rows * cols little-endian float32
+#
+# Storing the adjacency index means a memory-mapped load does no work per cell.
+MAGIC = b'PFGRID\x00\x00'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sIII12x')
+
+def _layout(rows, cols):
+    size = rows * cols
+    obstacles = _HEADER.size
+    adjacency = obstacles + size
+    terrain = (adjacency + size + 3) & ~3
+    return obstacles, adjacency, terrain, terrain + 4 * size
+
+def save_grid(grid, path):
+    """ Writes a grid's obstacles, adjacency index and terrain to `path`. """
+    _, _, terrain_offset, _ = _layout(grid.rows, grid.cols)
+    terrain = array('f', grid.terrain)
+    if sys.byteorder == 'big':
+        terrain.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, grid.rows, grid.cols))
+        f.write(grid.obstacles)
+        f.write(grid.adjacency)
+        f.write(bytes(terrain_offset - f.tell()))
+        f.write(terrain)
+
+def load_grid(path, use_mmap=True):
+    """
+    Loads a grid written by save_grid.
+
+    With use_mmap=True the grid's buffers are views into a private (copy-on-write)
+    memory map of the file, so loading costs the same for any map size and pages
+    are read only when touched; edits to the grid never reach the file. Otherwise
+    the file is read into memory.
+    """
+    with open(path, 'rb') as f:
+        magic, version, rows, cols = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a grid file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {version}")
+        obstacles, adjacency, terrain, end = _layout(rows, cols)
+        if use_mmap and sys.byteorder == 'little' and rows * cols:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            f.seek(0)
+            data = bytearray(f.read())
+    if len(data) < end:
+        raise ValueError(f"{path} is truncated")
+    view = memoryview(data)
+    if sys.byteorder == 'big':
+        swapped = array('f', view[terrain:end])
+        swapped.byteswap()
+        view[terrain:end] = memoryview(swapped).cast('B')
+    size = rows * cols
+    return Grid.from_buffers(rows, cols, view[obstacles:obstacles + size], view[terrain:end], view[adjacency:adjacency + size])
+
+# --- MovingAI benchmark files ---
+# Terrain letters of the MovingAI grid maps (https://movingai.com/benchmarks/formats.html).
+# Passable: '.' and 'G' (ground), 'S' (swamp, loaded at SWAMP_COST like the
+# visualizer's swamp). Everything else ('@', 'O' out of bounds, 'T' trees,
+# 'W' water) is an obstacle.
+SWAMP_COST = 5.0
+_PASSABLE = {ord('.'): 1.0, ord('G'): 1.0, ord('S'): SWAMP_COST}
+
+Scenario = namedtuple('Scenario', 'bucket map width height start goal optimal_length')
+Scenario.__doc__ = """
+One MovingAI scenario line. `start` and `goal` are (row, col) pairs. The listed
+optimal length assumes no corner cutting, which this grid allows, so it is an
+upper bound on the cost found here for maps with terrain cost 1.
+"""
+
+def load_movingai_map(path):
+    """ Builds a Grid from a MovingAI .map file. """
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines()
+    header = {}
+    for i, line in enumerate(lines):
+        fields = line.split()
+        if fields == [b'map']:
+            body = lines[i + 1:]
+            break
+        if fields:
+            header[fields[0].decode()] = fields[1].decode() if len(fields) > 1 else ''
+    else:
+        raise ValueError(f"{path} has no 'map' section")
+    rows, cols = int(header['height']), int(header['width'])
+    if len(body) < rows or any(len(line) < cols for line in body[:rows]):
+        raise ValueError(f"{path} is shorter than its {rows}x{cols} header")
+    letters = np.frombuffer(b''.join(line[:cols] for line in body[:rows]), dtype=np.uint8).reshape(rows, cols)
+    costs = np.zeros(256, dtype=np.float32)
+    for letter, cost in _PASSABLE.items():
+        costs[letter] = cost
+    terrain = costs[letters]
+    grid = Grid(rows, cols)
+    grid.obstacle_array()[:] = terrain == 0
+    grid.terrain_array()[:] = np.where(terrain == 0, 1.0, terrain)
+    grid.refresh()
+    return grid
+
+def load_movingai_scenarios(path):
+    """ Reads a MovingAI .scen file into a list of Scenario tuples. """
+    scenarios = []
+    with open(path) as f:
+        for line in f:
+            # Tab separated, but map names may then contain spaces.
+            fields = line.rstrip('\n').split('\t') if '\t' in line else line.split()
+            if len(fields) < 9 or fields[0] == 'version':
+                continue
+            # Columns: bucket, map, width, height, start x, start y, goal x, goal y, optimal length.
+            bucket, map_name = int(fields[0]), fields[1]
+            width, height, start_x, start_y, goal_x, goal_y = map(int, fields[2:8])
+            scenarios.append(Scenario(bucket, map_name, width, height, (start_y, start_x), (goal_y, goal_x), float(fields[8])))
+    return scenarios
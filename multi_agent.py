@@ -0,0 +1,273 @@
+import math
+import time
+
+from open_list import OpenList
+from heuristics import resolve_heuristic
+
+class ReservationTable:
+    """
+    Space-time reservations for cooperative pathfinding on one grid.
+
+    `occupied` maps t * size + cell to the cell its agent came from at time t - 1,
+    so one dict lookup answers both "is this cell taken at time t" and "would this
+    move swap places with another agent". `parked` maps a cell to the time an
+    agent finished there and stays for good, and `last_time` each cell to the
+    latest time it is reserved, which tells whether a goal can be held from some
+    time on. hold() and release() take a cell for one time step without touching
+    `last_time`, for agents that are not planned yet. Agents moving diagonally
+    past each other are not treated as a conflict.
+    """
+    __slots__ = ('size', 'occupied', 'parked', 'last_time', 'horizon')
+
+    def __init__(self, size):
+        self.size = size
+        self.clear()
+
+    def __len__(self):
+        return len(self.occupied)
+
+    def clear(self):
+        self.occupied = {}
+        self.parked = {}
+        self.last_time = {}
+        self.horizon = -1
+
+    def reserve(self, path, start_time, park=False):
+        """ Reserves `path` (one cell per time step from start_time); with park=True its last cell stays taken. """
+        size, occupied, last_time = self.size, self.occupied, self.last_time
+        previous = path[0]
+        for t, cell in enumerate(path, start_time):
+            occupied[t * size + cell] = previous
+            if last_time.get(cell, -1) < t:
+                last_time[cell] = t
+            previous = cell
+        end = start_time + len(path) - 1
+        self.horizon = max(self.horizon, end)
+        if park:
+            self.parked[path[-1]] = end
+
+    def hold(self, cell, t):
+        """ Reserves `cell` at time t for an agent staying there. """
+        self.occupied[t * self.size + cell] = cell
+
+    def release(self, cell, t):
+        """ Drops a hold() of `cell` at time t. """
+        self.occupied.pop(t * self.size + cell, None)
+
+    def is_free(self, cell, t):
+        return t * self.size + cell not in self.occupied and self.parked.get(cell, math.inf) > t
+
+def space_time_search(grid, reservations, start, goal, start_time=0, window=None, heuristic='octile', wait_cost=1.0, stats=None):
+    """
+    Cooperative A* for one agent over (cell, time) states: every step moves to a
+    neighbor or waits in place, never into a cell reserved at the arrival time
+    and never by swapping places with another agent. Returns the cells occupied at
+    start_time, start_time + 1, ... or None if there is no conflict-free path.
+
+    The path ends at `goal` once the goal can be held from that time on. With a
+    `window` the search stops `window` steps ahead instead when the goal is not
+    reached by then, and returns the partial path whose end looks cheapest
+    (cost so far plus the heuristic), as in windowed hierarchical cooperative A*.
+    Without one, time stops mattering after the last reservation, so those states
+    are merged and the search stays finite.
+    """
+    if stats is not None: stats.begin()
+    size, terrain, moves, adjacency = grid.size, grid.terrain, grid.moves, grid.adjacency
+    occupied, parked, last_time = reservations.occupied, reservations.parked, reservations.last_time
+    h = resolve_heuristic(heuristic).bind(grid, goal)
+    h_costs = {}  # a cell is reached at many times; estimate it once
+    if window is not None:
+        end_time = start_time + window
+        settled = end_time + 1  # never reached: the search stops at end_time
+    else:
+        # Times past the last reservation are all alike; states there share the time `settled`.
+        end_time, settled = None, max(reservations.horizon, start_time) + 1
+    goal_free_after = last_time.get(goal, -1)
+    start_key = start_time * size + start
+    g_cost = {start_key: 0.0}
+    parent = {start_key: None}
+    open_list = OpenList()
+    closed_set = set()
+    start_h = h(start)
+    open_list.push(start_key, start_h, start_h)
+    if stats is not None: stats.phase('search')
+    try:
+        while open_list:
+            current_key = open_list.pop()
+            t, current = divmod(current_key, size)
+            if (current == goal and t > goal_free_after) or (end_time is not None and t >= end_time):
+                if stats is not None: stats.phase('path')
+                path = []
+                while current_key is not None:
+                    path.append(current_key % size)
+                    current_key = parent[current_key]
+                path.reverse()
+                # Merged states stand for one step each, so the times stay consecutive.
+                return path
+            closed_set.add(current_key)
+            current_g = g_cost[current_key]
+            arrival = t + 1
+            arrival_key = (arrival if arrival < settled else settled) * size
+            came_from_key = arrival * size + current
+            generated = 0
+            for offset, distance in (*moves[adjacency[current]], (0, 0.0)):
+                neighbor = current + offset
+                if offset:
+                    step_cost = distance * terrain[neighbor]
+                elif t < settled:
+                    step_cost = wait_cost
+                else:
+                    continue  # waiting changes nothing once no reservation is ahead
+                neighbor_key = arrival_key + neighbor
+                if neighbor_key in closed_set:
+                    continue
+                if arrival < settled:
+                    if arrival * size + neighbor in occupied or occupied.get(came_from_key) == neighbor:
+                        continue
+                if parked.get(neighbor, math.inf) <= arrival:
+                    continue
+                generated += 1
+                tentative_g_cost = current_g + step_cost
+                if tentative_g_cost < g_cost.get(neighbor_key, math.inf):
+                    parent[neighbor_key] = current_key
+                    g_cost[neighbor_key] = tentative_g_cost
+                    h_cost = h_costs.get(neighbor)
+                    if h_cost is None:
+                        h_cost = h_costs[neighbor] = h(neighbor)
+                    open_list.push(neighbor_key, tentative_g_cost + h_cost, h_cost)
+            if stats is not None: stats.expanded(generated, len(open_list))
+        return None
+    finally:
+        if stats is not None: stats.end(open_list)
+
+class Agent:
+    """ One agent: where it is, where it is going, its planning priority and its current plan. """
+    __slots__ = ('id', 'position', 'goal', 'priority', 'plan', 'plan_time')
+
+    def __init__(self, agent_id, start, goal, priority=0):
+        self.id = agent_id
+        self.position = start
+        self.goal = goal
+        self.priority = priority
+        self.plan = [start]
+        self.plan_time = 0
+
+    @property
+    def arrived(self):
+        return self.position == self.goal
+
+    def __repr__(self):
+        return f"Agent({self.id}, position={self.position}, goal={self.goal})"
+
+class MultiAgentPlanner:
+    """
+    Windowed cooperative A* (WHCA*) for many agents on one grid.
+
+    Every `replan_every` steps (default: half the window) all agents are planned
+    again in priority order (higher `priority` first, then by id) against one
+    shared ReservationTable: each agent runs space_time_search `window` steps
+    ahead and reserves its path, so later agents route around earlier ones. Until
+    its turn comes, every agent holds its current cell for the next step, so
+    earlier agents route around it too. The table only ever holds one window, so
+    it stays small however long the run. An agent that finishes inside the window
+    parks on its goal. An agent with no conflict-free path through the window
+    waits in place for one step, which its hold keeps free, and everyone is
+    replanned before the next step.
+
+    step() also checks the moves it makes: `conflicts` counts the agents that
+    shared a cell or swapped places, which stays 0.
+
+    Planning throughput is tracked in `agents_planned` and `planning_seconds`;
+    `agents_per_second` is their ratio.
+    """
+    def __init__(self, grid, window=16, replan_every=None, heuristic='octile', wait_cost=1.0):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.grid = grid
+        self.window = window
+        self.replan_every = replan_every or max(1, window // 2)
+        if self.replan_every > window:
+            raise ValueError("replan_every cannot exceed the window")
+        self.heuristic = resolve_heuristic(heuristic)
+        self.wait_cost = wait_cost
+        self.agents = []
+        self.reservations = ReservationTable(grid.size)
+        self.time = 0
+        self._last_plan = None
+        self.agents_planned = 0
+        self.failed_plans = 0
+        self.planning_seconds = 0.0
+        self.conflicts = 0
+
+    def add_agent(self, start, goal, priority=0):
+        """ Adds an agent between two cell ids and returns it; it is planned at the next step. """
+        agent = Agent(len(self.agents), start, goal, priority)
+        agent.plan_time = self.time
+        self.agents.append(agent)
+        self._last_plan = None
+        return agent
+
+    @property
+    def agents_per_second(self):
+        return self.agents_planned / self.planning_seconds if self.planning_seconds else 0.0
+
+    @property
+    def all_arrived(self):
+        return all(agent.arrived for agent in self.agents)
+
+    def positions(self):
+        return [agent.position for agent in self.agents]
+
+    def plan(self, stats=None):
+        """ Replans every agent from the current time. """
+        started = time.perf_counter()
+        table = self.reservations
+        table.clear()
+        now, window = self.time, self.window
+        for agent in self.agents:
+            table.hold(agent.position, now)
+            table.hold(agent.position, now + 1)
+        failed = False
+        for agent in sorted(self.agents, key=lambda a: (-a.priority, a.id)):
+            table.release(agent.position, now)
+            table.release(agent.position, now + 1)
+            path = space_time_search(self.grid, table, agent.position, agent.goal, now, window,
+                                     self.heuristic, self.wait_cost, stats)
+            if path is None:
+                # Nobody else could take the cell at now + 1, so waiting one step is safe.
+                self.failed_plans += 1
+                failed = True
+                table.reserve([agent.position] * 2, now)
+                agent.plan, agent.plan_time = [agent.position] * 2, now
+                continue
+            end = now + len(path) - 1
+            table.reserve(path, now, park=path[-1] == agent.goal and table.last_time.get(agent.goal, -1) < end)
+            agent.plan, agent.plan_time = path, now
+        self.agents_planned += len(self.agents)
+        self.planning_seconds += time.perf_counter() - started
+        # The other plans only route around a failed agent for one step, so replan after it.
+        self._last_plan = None if failed else now
+
+    def step(self, stats=None):
+        """ Moves every agent one step along its plan, replanning first when due. """
+        if self._last_plan is None or self.time - self._last_plan >= self.replan_every:
+            self.plan(stats)
+        self.time += 1
+        moves = {}
+        for agent in self.agents:
+            index = self.time - agent.plan_time
+            if index < len(agent.plan):
+                moves[agent.position] = agent.plan[index]
+                agent.position = agent.plan[index]
+            else:
+                moves[agent.position] = agent.position
+        self.conflicts += len(self.agents) - len(set(moves.values()))
+        self.conflicts += sum(1 for cell, to in moves.items() if to != cell and moves.get(to) == cell) // 2
+
+    def run(self, max_steps=1000, stats=None):
+        """ Steps until every agent has arrived or max_steps have passed; returns the steps taken. """
+        for steps in range(max_steps):
+            if self.all_arrived:
+                return steps
+            self.step(stats)
+        return max_steps
@@ -0,0 +1,69 @@
+import heapq
+import math
+
+class OpenList:
+    """
+    Open list shared by the grid searches: a binary heap with lazy deletion.
+
+    Each cell has at most one live entry, recorded in `entries` with its current
+    f-cost. Pushing a cell that is already open with a better f-cost is a
+    decrease-key: the new entry is pushed and the old one becomes stale, and stale
+    entries are skipped when they reach the top of the heap. Ties on f are broken
+    on h (prefer cells closer to the goal) and then on the cell id, so expansion
+    order is deterministic.
+    """
+    __slots__ = ('_heap', 'entries', 'pushes', 'pops', 'stale_pops')
+
+    def __init__(self):
+        self._heap = []
+        self.entries = {}
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def __contains__(self, cell):
+        return cell in self.entries
+
+    def push(self, cell, f_cost, h_cost=0.0):
+        """ Adds a cell, or re-keys it if it is already open. """
+        self.entries[cell] = f_cost
+        heapq.heappush(self._heap, (f_cost, h_cost, cell))
+        self.pushes += 1
+
+    def remove(self, cell):
+        """ Drops a cell from the open list; its heap entry becomes stale. """
+        self.entries.pop(cell, None)
+
+    def _discard_stale(self):
+        heap, entries = self._heap, self.entries
+        while heap:
+            f_cost, _, cell = heap[0]
+            if entries.get(cell) == f_cost:
+                return
+            heapq.heappop(heap)
+            self.stale_pops += 1
+
+    def pop(self):
+        """ Removes and returns the open cell with the lowest (f, h), or None if empty. """
+        self._discard_stale()
+        if not self._heap:
+            return None
+        _, _, cell = heapq.heappop(self._heap)
+        del self.entries[cell]
+        self.pops += 1
+        return cell
+
+    def min_f(self):
+        """ Lowest f-cost among the open cells, or infinity if empty. """
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else math.inf
+
+    def clear(self):
+        self._heap.clear()
+        self.entries.clear()
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+from algorithms import a_star_search, dijkstra_search, bidirectional_search
+from incremental import d_star_lite_search
+
+# Searches whose paths are cheapest paths, so every stretch of a cached path is
+# itself a cheapest path between its ends and can answer that query directly.
+OPTIMAL_SEARCHES = {a_star_search, dijkstra_search, bidirectional_search, d_star_lite_search}
+
+# Keyword arguments that do not change a search's result.
+UNKEYED_KWARGS = {'trace', 'stats'}
+
+class PathCache:
+    """
+    Bounded LRU cache of search results for one grid, keyed on
+    (algorithm, keyword arguments, start, end, grid.version).
+
+    Any edit bumps grid.version, which makes every cached entry unreachable; the
+    cache notices the new version on the next lookup and drops them. Failed
+    searches are cached too. For optimal searches (OPTIMAL_SEARCHES, with no weight
+    above 1 and an admissible heuristic) a query whose start and end both lie on a
+    cached path, in that order, is answered with the stretch between them.
+    """
+    def __init__(self, grid, maxsize=1024, subpaths=True):
+        self.grid = grid
+        self.maxsize = maxsize
+        self.subpaths = subpaths
+        self._entries = OrderedDict()  # key -> path cell ids, or None if not found
+        self._index = {}               # (algorithm key, cell) -> {key: position of cell}
+        self._version = grid.version
+        self.hits = 0
+        self.subpath_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+
+    def stats(self):
+        lookups = self.hits + self.subpath_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'subpath_hits': self.subpath_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.hits + self.subpath_hits) / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _reuses_subpaths(algorithm, kwargs):
+        return (algorithm in OPTIMAL_SEARCHES and kwargs.get('weight', 1.0) <= 1.0
+                and kwargs.get('heuristic', 'octile') != 'manhattan')
+
+    def _store(self, key, cells, indexed):
+        self._entries[key] = cells
+        if cells is not None and indexed:
+            algorithm_key = key[:2]
+            for position, cell in enumerate(cells):
+                self._index.setdefault((algorithm_key, cell), {})[key] = position
+        while len(self._entries) > self.maxsize:
+            old_key, old_cells = self._entries.popitem(last=False)
+            self.evictions += 1
+            if old_cells is not None:
+                for cell in old_cells:
+                    positions = self._index.get((old_key[:2], cell))
+                    if positions is not None:
+                        positions.pop(old_key, None)
+                        if not positions:
+                            del self._index[(old_key[:2], cell)]
+
+    def _find_subpath(self, algorithm_key, start, end):
+        on_start = self._index.get((algorithm_key, start))
+        on_end = self._index.get((algorithm_key, end))
+        if not on_start or not on_end:
+            return None
+        if len(on_end) < len(on_start):
+            on_start, on_end = on_end, on_start
+            swapped = True
+        else:
+            swapped = False
+        for key, position in on_start.items():
+            other = on_end.get(key)
+            if other is None:
+                continue
+            start_position, end_position = (other, position) if swapped else (position, other)
+            if start_position <= end_position:
+                self._entries.move_to_end(key)
+                return self._entries[key][start_position:end_position + 1]
+        return None
+
+    def search(self, algorithm, draw_callback, grid, start_node, end_node, **kwargs):
+        """
+        Same call and return value as algorithm(draw_callback, grid, start_node,
+        end_node, **kwargs), answered from the cache when possible. A cache hit
+        reports 0 nodes explored and neither calls draw_callback nor records a trace or stats.
+        A search cancelled by draw_callback is not cached.
+        """
+        if grid is not self.grid:
+            raise ValueError("PathCache is bound to a different grid")
+        if grid.version != self._version:
+            self.invalidations += len(self._entries)
+            self.clear()
+            self._version = grid.version
+        # Traces and stats only observe the search, so they are not part of the key.
+        algorithm_key = (algorithm, tuple(sorted((k, v) for k, v in kwargs.items() if k not in UNKEYED_KWARGS)))
+        key = algorithm_key + (start_node.id, end_node.id, grid.version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            cells = self._entries[key]
+        else:
+            cells = None
+            indexed = self.subpaths and self._reuses_subpaths(algorithm, kwargs)
+            if indexed:
+                cells = self._find_subpath(algorithm_key, start_node.id, end_node.id)
+            if cells is None:
+                self.misses += 1
+                cancelled = []
+                def watched_callback(*args, **kw):
+                    if draw_callback(*args, **kw) is False:
+                        cancelled.append(True)
+                        return False
+                callback = watched_callback if draw_callback else draw_callback
+                found, path, explored = algorithm(callback, grid, start_node, end_node, **kwargs)
+                if not cancelled:
+                    self._store(key, [node.id for node in path] if found else None, indexed)
+                return found, path, explored
+            self.subpath_hits += 1
+        if cells is None:
+            return False, {}, 0
+        return True, [grid.node(cell) for cell in cells], 0
@@ -0,0 +1,147 @@
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+# --- Events ---
+# A trace is a flat array of int64 events, one per expansion or open-list push,
+# each encoded as cell << KIND_BITS | kind. Bidirectional search tags the events
+# of its backward frontier with the _BWD kinds.
+EXPAND, PUSH, EXPAND_BWD, PUSH_BWD = range(4)
+KIND_BITS = 2
+KIND_MASK = (1 << KIND_BITS) - 1
+
+class SearchTrace:
+    """
+    Event log of one search. A search called with trace=SearchTrace() appends an
+    event per expansion and per open-list push, in order; `path` is filled by
+    record_search. Recording is one array append per event, so traces can be
+    taken at full search speed and replayed, scrubbed or analysed afterwards.
+    """
+    __slots__ = ('rows', 'cols', 'events', 'path')
+
+    def __init__(self, rows=0, cols=0, events=None, path=None):
+        self.rows, self.cols = rows, cols
+        self.events = array('q') if events is None else events
+        self.path = array('q') if path is None else path
+
+    def __len__(self):
+        return len(self.events)
+
+    def decode(self, stop=None):
+        """ (cells, kinds) int64 arrays for the first `stop` events (all by default). """
+        events = np.frombuffer(self.events, dtype=np.int64)[:stop] if self.events else np.zeros(0, dtype=np.int64)
+        return events >> KIND_BITS, events & KIND_MASK
+
+    @property
+    def bidirectional(self):
+        _, kinds = self.decode()
+        return bool((kinds >= EXPAND_BWD).any())
+
+    def expansions(self, backward=False):
+        """ Expanded cells in expansion order, for one frontier. """
+        cells, kinds = self.decode()
+        return cells[kinds == (EXPAND_BWD if backward else EXPAND)]
+
+    def state(self, position):
+        """
+        Frontiers after the first `position` events, as four sets:
+        (open, closed, open backward, closed backward). A cell is open once pushed
+        and closed once expanded, so this is computed without replaying the events.
+        """
+        cells, kinds = self.decode(position)
+        result = []
+        for push, expand in ((PUSH, EXPAND), (PUSH_BWD, EXPAND_BWD)):
+            closed = set(np.unique(cells[kinds == expand]).tolist())
+            result.append(set(np.unique(cells[kinds == push]).tolist()) - closed)
+            result.append(closed)
+        return tuple(result)
+
+class TracePlayer:
+    """
+    Replay cursor over a SearchTrace. seek() moves forward by applying events one by
+    one and backward by recomputing the state with SearchTrace.state, so playback
+    costs time proportional to the events played and scrubbing back stays cheap.
+    """
+    def __init__(self, trace):
+        self.trace = trace
+        self._cells, self._kinds = (a.tolist() for a in trace.decode())
+        self.position = 0
+        self.open, self.closed, self.open_bwd, self.closed_bwd = set(), set(), set(), set()
+
+    def __len__(self):
+        return len(self._cells)
+
+    @property
+    def done(self):
+        return self.position >= len(self._cells)
+
+    def seek(self, position):
+        position = max(0, min(position, len(self._cells)))
+        if position < self.position:
+            self.open, self.closed, self.open_bwd, self.closed_bwd = self.trace.state(position)
+        else:
+            frontiers = ((self.open, self.closed), (self.open_bwd, self.closed_bwd))
+            for cell, kind in zip(self._cells[self.position:position], self._kinds[self.position:position]):
+                open_set, closed_set = frontiers[kind >> 1]
+                if kind & 1:
+                    if cell not in closed_set:
+                        open_set.add(cell)
+                else:
+                    open_set.discard(cell)
+                    closed_set.add(cell)
+        self.position = position
+
+    def step(self, count):
+        """ Moves `count` events forward (or backward if negative). """
+        self.seek(self.position + count)
+
+def record_search(search, draw_callback, grid, start_node, end_node, **kwargs):
+    """
+    Runs search(draw_callback, grid, start_node, end_node, trace=..., **kwargs) and
+    returns (found, path, explored, trace) with the path stored in the trace.
+    """
+    trace = SearchTrace(grid.rows, grid.cols)
+    found, path, explored = search(draw_callback, grid, start_node, end_node, trace=trace, **kwargs)
+    if found:
+        trace.path.extend(node.id for node in path)
+    return found, path, explored, trace
+
+# --- Trace files ---
+# A 40-byte header followed by the events and the path cells, all little-endian int64:
+#
+#     magic (8s) | format version (uint32) | rows (uint32) | cols (uint32) | event count (uint64) | path length (uint64)
+MAGIC = b'PFTRACE\x00'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sIIIQQ4x')
+
+def save_trace(trace, path):
+    """ Writes a trace to `path`. """
+    events, cells = array('q', trace.events), array('q', trace.path)
+    if sys.byteorder == 'big':
+        events.byteswap()
+        cells.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, trace.rows, trace.cols, len(events), len(cells)))
+        f.write(events)
+        f.write(cells)
+
+def load_trace(path):
+    """ Reads a trace written by save_trace. """
+    with open(path, 'rb') as f:
+        magic, version, rows, cols, event_count, path_length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {version}")
+        events, cells = array('q'), array('q')
+        try:
+            events.fromfile(f, event_count)
+            cells.fromfile(f, path_length)
+        except EOFError:
+            raise ValueError(f"{path} is truncated") from None
+    if sys.byteorder == 'big':
+        events.byteswap()
+        cells.byteswap()
+    return SearchTrace(rows, cols, events, cells)
@@ -0,0 +1,70 @@
+import time
+
+class SearchStats:
+    """
+    Opt-in counters and phase timers for the searches. Pass stats=SearchStats() to
+    any search; without one a search does no bookkeeping beyond a None check per
+    expansion. One object can be passed to many searches to accumulate totals
+    (peak_open keeps the maximum).
+
+    expansions        cells expanded (the `explored` count every search returns)
+    generated         neighbors or jump successors produced by those expansions
+    pushes, pops      open-list operations; stale_pops counts superseded heap
+                      entries skipped on the way to a live one
+    peak_open         largest open-list size seen after an expansion
+    line_checks       straight-line checks (Grid.line_cost / line_of_sight) by Theta*
+    jump_calls        JPS jump scans, including the nested straight scans of a
+                      diagonal jump, or JPS+ table lookups
+    timers            seconds per phase, e.g. 'setup', 'search', 'path'
+    """
+    COUNTERS = ('searches', 'expansions', 'generated', 'pushes', 'pops', 'stale_pops', 'peak_open',
+                'line_checks', 'jump_calls')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.timers = {}
+        self._phase = None
+        self._phase_started = 0.0
+
+    # --- Called by the searches ---
+    def begin(self, phase='setup'):
+        """ Starts a search, timing `phase`. """
+        self.searches += 1
+        self._phase, self._phase_started = phase, time.perf_counter()
+
+    def phase(self, name):
+        """ Ends the running phase and starts timing `name`. """
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.timers[self._phase] = self.timers.get(self._phase, 0.0) + now - self._phase_started
+        self._phase, self._phase_started = name, now
+
+    def expanded(self, generated, open_size):
+        self.expansions += 1
+        self.generated += generated
+        if open_size > self.peak_open:
+            self.peak_open = open_size
+
+    def end(self, *open_lists):
+        """ Ends a search: closes the running phase and folds in the open lists' counters. """
+        self.phase(None)
+        for open_list in open_lists:
+            self.pushes += open_list.pushes
+            self.pops += open_list.pops
+            self.stale_pops += open_list.stale_pops
+
+    # --- Reporting ---
+    def as_dict(self):
+        """ Counters plus one '<phase>_ms' entry per timed phase. """
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result.update((f"{phase}_ms", seconds * 1000) for phase, seconds in self.timers.items())
+        return result
+
+    def __repr__(self):
+        fields = ', '.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in self.as_dict().items())
+        return f"SearchStats({fields})"
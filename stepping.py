@@ -0,0 +1,129 @@
+import asyncio
+import math
+import time
+
+from algorithms import SEARCH_STEPS, multi_goal_steps
+
+# Stepper status values.
+RUNNING, FOUND, NOT_FOUND, CANCELLED, OUT_OF_BUDGET = 'running', 'found', 'not found', 'cancelled', 'out of budget'
+
+_STEP_FUNCTIONS = set(SEARCH_STEPS.values())
+
+# Path a stopped search reports, matching the search's own "not found" value;
+# k_nearest_goals_search returns a list of paths.
+_NO_PATH = {multi_goal_steps: list}
+
+class SearchStepper:
+    """
+    A search from algorithms.py run in slices. step(n) advances it by up to n
+    expansions and run_for(seconds) by a wall-clock slice (at least one expansion);
+    between slices the search keeps its open list and cost maps, so a game loop can
+    spread a long search over frames. cancel() stops it early.
+
+    `max_expansions` and `max_seconds` bound the whole search (time spent inside
+    slices only); a search that reaches either ends with status OUT_OF_BUDGET.
+    A draw_callback returning False cancels the search as usual, with status
+    CANCELLED. Once `done`, `result` is (found, path, explored) in the form the
+    search returns; stopped searches report no path.
+
+        stepper = SearchStepper(a_star_search, grid, start_node, end_node, max_seconds=2.0)
+        while not stepper.run_for(0.004):   # once per frame
+            ...
+    """
+    def __init__(self, search, grid, start_node, end_node, draw_callback=None, max_expansions=None, max_seconds=None, **kwargs):
+        steps = SEARCH_STEPS.get(search, search)
+        if steps not in _STEP_FUNCTIONS:
+            raise ValueError(f"{getattr(search, '__name__', search)!r} has no stepping form; "
+                             f"expected one of {sorted(f.__name__ for f in SEARCH_STEPS)}")
+        if draw_callback is not None:
+            draw_callback = self._watch(draw_callback)
+        self._steps = steps(draw_callback, grid, start_node, end_node, **kwargs)
+        self._no_path = _NO_PATH.get(steps, dict)
+        self._callback_cancelled = False
+        self.max_expansions, self.max_seconds = max_expansions, max_seconds
+        self.expansions = 0
+        self.elapsed = 0.0
+        self.status = RUNNING
+        self.result = None
+
+    def _watch(self, draw_callback):
+        def callback(*args, **kwargs):
+            keep_going = draw_callback(*args, **kwargs)
+            if keep_going is False:
+                self._callback_cancelled = True
+            return keep_going
+        return callback
+
+    @property
+    def done(self):
+        return self.status != RUNNING
+
+    def step(self, count=1):
+        """ Advances by up to `count` expansions. Returns True once the search is done. """
+        return self._advance(count, None)
+
+    def run_for(self, seconds):
+        """ Advances for up to `seconds` of wall-clock time. Returns True once the search is done. """
+        return self._advance(None, seconds)
+
+    def run(self):
+        """ Runs to the end (or the budget) and returns the result. """
+        self._advance(None, None)
+        return self.result
+
+    def cancel(self):
+        """ Stops the search; does nothing once it is done. """
+        if not self.done:
+            self._stop(CANCELLED)
+
+    def _stop(self, status):
+        # Closing the generator runs its finally blocks, so stats are still folded in.
+        self._steps.close()
+        self.status, self.result = status, (False, self._no_path(), self.expansions)
+
+    def _advance(self, count, seconds):
+        if self.done:
+            return True
+        clock = time.perf_counter
+        started = clock()
+        deadline = started + seconds if seconds is not None else math.inf
+        if self.max_seconds is not None:
+            deadline = min(deadline, started + self.max_seconds - self.elapsed)
+        limit = self.expansions + count if count is not None else math.inf
+        if self.max_expansions is not None:
+            limit = min(limit, self.max_expansions)
+        steps, expansions = self._steps, self.expansions
+        try:
+            while expansions < limit:
+                expansions = next(steps)
+                if clock() >= deadline:
+                    break
+        except StopIteration as finished:
+            self.result = finished.value
+            expansions = self.result[2]
+            if self._callback_cancelled:
+                self.status = CANCELLED
+            else:
+                self.status = FOUND if self.result[0] else NOT_FOUND
+        finally:
+            self.expansions = expansions
+            self.elapsed += clock() - started
+        if not self.done and ((self.max_expansions is not None and expansions >= self.max_expansions) or
+                              (self.max_seconds is not None and self.elapsed >= self.max_seconds)):
+            self._stop(OUT_OF_BUDGET)
+        return self.done
+
+async def search_async(search, grid, start_node, end_node, slice_seconds=0.002, max_expansions=None, max_seconds=None, **kwargs):
+    """
+    Runs a search on the asyncio event loop in slices of `slice_seconds`, giving
+    other tasks a turn between slices, and returns (found, path, explored).
+    Cancelling the task cancels the search.
+    """
+    stepper = SearchStepper(search, grid, start_node, end_node, max_expansions=max_expansions,
+                            max_seconds=max_seconds, **kwargs)
+    try:
+        while not stepper.run_for(slice_seconds):
+            await asyncio.sleep(0)
+    finally:
+        stepper.cancel()
+    return stepper.result